@@ -0,0 +1,326 @@
+"""Benchmark BotManager against fleets of synthetic stand-in bots.
+
+    python benchmark.py --bots 10 100 500 --duration 30 --output bench.json
+
+Every fleet size runs in its own child process, so the threads and memory
+of one run never leak into the next. A run builds a temporary base
+directory of stand-in bots, each a small script installed as start.exe
+with its own stdout rate, console.txt rate, CPU burn and crash chance. It
+then bulk-starts them, measures a steady window, bulk-stops them and
+writes one JSON result. Compare the output files of two versions to spot
+regressions.
+
+The stand-ins are scripts with a shebang line, so this needs a POSIX
+system; Windows would need a real start.exe per bot.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import platform
+import argparse
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+
+import psutil
+
+FAKE_BOT = r'''#!{python}
+import json, os, random, sys, time
+
+with open("fakebot.json") as f:
+    cfg = json.load(f)
+random.seed(os.getpid())
+os.makedirs("logs", exist_ok=True)
+console = open(os.path.join("logs", "console.txt"), "a")
+
+TICK = 0.1
+stdout_due = console_due = 0.0
+seq = 0
+next_tick = time.monotonic()
+while True:
+    # Busy-wait the configured fraction of every tick, sleep the rest
+    burn_until = time.monotonic() + TICK * cfg["cpu"]
+    while time.monotonic() < burn_until:
+        pass
+    stdout_due += cfg["stdout_rate"] * TICK
+    if stdout_due >= 1:
+        while stdout_due >= 1:
+            seq += 1
+            stdout_due -= 1
+            sys.stdout.write(f"[fake] {{seq}} Weight: 1234 card drop check\n")
+        sys.stdout.flush()
+    console_due += cfg["console_rate"] * TICK
+    if console_due >= 1:
+        while console_due >= 1:
+            console_due -= 1
+            console.write(f"{{time.strftime('%H:%M:%S')}} [fake] console line\n")
+        console.flush()
+    if random.random() < cfg["crash_probability"] * TICK:
+        sys.exit(3)
+    next_tick += TICK
+    time.sleep(max(0.0, next_tick - time.monotonic()))
+'''
+
+def percentiles(values, scale=1000.0):
+    """p50/p90/p99/max of a list of seconds, in milliseconds by default"""
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * scale, 3)
+    return {'count': len(ordered), 'p50': pick(0.50), 'p90': pick(0.90), 'p99': pick(0.99),
+            'max': round(ordered[-1] * scale, 3)}
+
+def timed(func, durations):
+    """Wrap func so every call appends (finished at, duration) to durations"""
+    def wrapper(*args, **kwargs):
+        began = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            durations.append((time.time(), time.perf_counter() - began))
+    return wrapper
+
+def build_fleet(root, count, args):
+    """Create count stand-in bot folders under root/bots; returns their names"""
+    base_dir = os.path.join(root, "bots")
+    script = FAKE_BOT.format(python=sys.executable)
+    settings = {'stdout_rate': args.stdout_rate, 'console_rate': args.console_rate,
+                'cpu': min(1.0, max(0.0, args.cpu)), 'crash_probability': args.crash_probability}
+    bots = []
+    for index in range(count):
+        bot_folder = f"fake{index:04d}"
+        folder = os.path.join(base_dir, bot_folder)
+        os.makedirs(os.path.join(folder, "logs"))
+        start_path = os.path.join(folder, "start.exe")
+        with open(start_path, "w") as f:
+            f.write(script)
+        os.chmod(start_path, 0o755)
+        with open(os.path.join(folder, "fakebot.json"), "w") as f:
+            json.dump(settings, f)
+        bots.append(bot_folder)
+
+    config = {
+        "base_directory": base_dir,
+        "bot_folders": bots,
+        "all_bots": bots,
+        "auto_restart": False,
+        "capture_output": not args.no_capture,
+        "crash_restart": args.crash_probability > 0,
+        "watchdog_enabled": args.watchdog,
+        "bulk_max_in_flight": args.max_in_flight,
+        "bulk_launches_per_second": args.launch_rate,
+        "metrics_interval": args.metrics_interval,
+        "log_filter": {"include": ["card"], "exclude": [], "ignore_case": True}
+    }
+    with open(os.path.join(root, "bot_config.json"), "w") as f:
+        json.dump(config, f, indent=4)
+    return bots
+
+def wait_for_job(job, timeout):
+    deadline = time.time() + timeout
+    while job.finished is None and time.time() < deadline:
+        time.sleep(0.05)
+    return job.finished is not None
+
+def captured_lines(manager):
+    return sum(ring.next_seq for ring in list(manager.bot_outputs.values()))
+
+def run_phases(manager, bots, args, result, window):
+    """Bulk start, steady-state measurement and bulk stop; fills result"""
+    me = psutil.Process()
+
+    began = time.perf_counter()
+    job = manager.submit_job('start', bots)
+    finished = wait_for_job(job, args.job_timeout)
+    result['bulk_start_s'] = round(time.perf_counter() - began, 3)
+    result['bulk_start_ok'] = job.progress()[1]
+    result['bulk_start_finished'] = finished
+
+    time.sleep(args.warmup)
+
+    cpu_before = me.cpu_times()
+    lines_before = captured_lines(manager)
+    window['start'] = time.time()
+    wall_began = time.perf_counter()
+    rss = []
+    threads = []
+    while time.perf_counter() - wall_began < args.duration:
+        rss.append(me.memory_info().rss)
+        threads.append(me.num_threads())
+        time.sleep(min(1.0, max(0.0, args.duration - (time.perf_counter() - wall_began))))
+    wall = time.perf_counter() - wall_began
+    window['end'] = time.time()
+    cpu_after = me.cpu_times()
+    lines_after = captured_lines(manager)
+
+    cpu_seconds = (cpu_after.user - cpu_before.user) + (cpu_after.system - cpu_before.system)
+    result['window_s'] = round(wall, 3)
+    result['manager_cpu_percent'] = round(100.0 * cpu_seconds / wall, 2)
+    result['manager_rss_mb'] = {'end': round(rss[-1] / 1048576, 2), 'peak': round(max(rss) / 1048576, 2)}
+    result['manager_threads'] = {'end': threads[-1], 'peak': max(threads)}
+    result['capture_lines_per_s'] = round((lines_after - lines_before) / wall, 1)
+    result['offered_lines_per_s'] = round(len(bots) * args.stdout_rate, 1) if not args.no_capture else 0
+    result['running_at_end'] = sum(1 for bot_folder in bots if manager.is_bot_running(bot_folder))
+    result['crashes'] = sum(manager.bot_crashes.values())
+
+    began = time.perf_counter()
+    job = manager.submit_job('stop', bots)
+    finished = wait_for_job(job, args.job_timeout)
+    result['bulk_stop_s'] = round(time.perf_counter() - began, 3)
+    result['bulk_stop_ok'] = job.progress()[1]
+    result['bulk_stop_finished'] = finished
+
+def run_one(count, args):
+    """Child process: benchmark one fleet size and write the result JSON"""
+    root = tempfile.mkdtemp(prefix=f"koremanager-bench-{count}-")
+    result = {'bots': count}
+    try:
+        bots = build_fleet(root, count, args)
+        # BotManager reads bot_config.json and writes its log and journal in the cwd
+        os.chdir(root)
+        import koremanager
+
+        manager = koremanager.BotManager()
+        refresh_times = []
+        sample_times = []
+        manager.refresh_status_cache = timed(manager.refresh_status_cache, refresh_times)
+        manager.metrics_sampler.sample_once = timed(manager.metrics_sampler.sample_once, sample_times)
+        manager.metrics_sampler.start()
+
+        window = {}
+        lags = []
+        if args.gui:
+            try:
+                manager.create_main_window()
+            except Exception as e:
+                result['tk_error'] = str(e)
+        if manager.main_window is not None:
+            # Phases run on a worker; the Tk thread only probes its own timer lag
+            done = threading.Event()
+            interval = args.tk_probe_ms / 1000.0
+
+            def probe(expected):
+                now = time.time()
+                lags.append((now, max(0.0, now - expected)))
+                if done.is_set():
+                    manager.main_window.quit()
+                    return
+                manager.main_window.after(args.tk_probe_ms, probe, time.time() + interval)
+
+            def phases():
+                try:
+                    run_phases(manager, bots, args, result, window)
+                except Exception as e:
+                    result['error'] = str(e)
+                done.set()
+
+            threading.Thread(target=phases, daemon=True).start()
+            manager.main_window.after(args.tk_probe_ms, probe, time.time() + interval)
+            manager.main_window.mainloop()
+        else:
+            run_phases(manager, bots, args, result, window)
+
+        manager.metrics_sampler.stop()
+        # Only the steady window counts; bulk start and stop are measured on their own
+        start, end = window.get('start', 0), window.get('end', 0)
+        result['status_refresh_ms'] = percentiles([d for ts, d in refresh_times if start <= ts <= end])
+        result['metrics_sample_ms'] = percentiles([d for ts, d in sample_times if start <= ts <= end])
+        result['tk_lag_ms'] = percentiles([lag for ts, lag in lags if start <= ts <= end]) if lags else None
+        # The manager's own per-path timings over the whole run, bulk phases included
+        result['hot_paths'] = manager.hot_paths.summary()
+    except Exception as e:
+        result['error'] = str(e)
+    finally:
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+        else:
+            result['directory'] = root
+    return result
+
+def manager_fingerprint():
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "koremanager.py")
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(prog="benchmark", description="Measure BotManager overhead with fake bots")
+    parser.add_argument("--bots", type=int, nargs="+", default=[10, 100, 500], help="fleet sizes to run")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of steady-state measurement")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds between bulk start and measuring")
+    parser.add_argument("--stdout-rate", type=float, default=10, help="stdout lines per second per bot")
+    parser.add_argument("--console-rate", type=float, default=2, help="console.txt lines per second per bot")
+    parser.add_argument("--cpu", type=float, default=0.0, help="fraction of one core each bot burns (0-1)")
+    parser.add_argument("--crash-probability", type=float, default=0.0, help="chance per second that a bot crashes")
+    parser.add_argument("--no-capture", action="store_true", help="run bots with capture_output off")
+    parser.add_argument("--watchdog", action="store_true", help="enable the liveness watchdog")
+    parser.add_argument("--gui", action="store_true", help="open the main window and measure Tk main-loop lag")
+    parser.add_argument("--tk-probe-ms", type=int, default=50, help="Tk lag probe interval")
+    parser.add_argument("--max-in-flight", type=int, default=8, help="bulk_max_in_flight for the run")
+    parser.add_argument("--launch-rate", type=float, default=0, help="bulk_launches_per_second (0: unlimited)")
+    parser.add_argument("--metrics-interval", type=float, default=1.0, help="metrics_interval for the run")
+    parser.add_argument("--job-timeout", type=float, default=600, help="give up on a bulk job after this long")
+    parser.add_argument("--label", default="", help="free text stored with the results, e.g. a version")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary bot directories")
+    parser.add_argument("--output", default="", help="write results here instead of stdout")
+    parser.add_argument("--child-result", default="", help=argparse.SUPPRESS)
+    return parser
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    if os.name == "nt":
+        print("benchmark: the stand-in bots are shebang scripts and need a POSIX system", file=sys.stderr)
+        return 2
+
+    if args.child_result:
+        result = run_one(args.bots[0], args)
+        with open(args.child_result, "w") as f:
+            json.dump(result, f)
+        # The manager's worker threads are not built to be joined; leave like quit_application does
+        sys.stdout.flush()
+        os._exit(0)
+
+    own_args = list(sys.argv[1:] if argv is None else argv)
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'label': args.label,
+        'manager_sha1': manager_fingerprint(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'params': {key: value for key, value in vars(args).items()
+                   if key not in ('bots', 'output', 'child_result', 'keep', 'label')},
+        'runs': []
+    }
+    for count in args.bots:
+        print(f"benchmark: {count} bots...", file=sys.stderr)
+        handle, result_path = tempfile.mkstemp(prefix="koremanager-bench-", suffix=".json")
+        os.close(handle)
+        try:
+            child = own_args + ["--bots", str(count), "--child-result", result_path]
+            code = subprocess.call([sys.executable, os.path.abspath(__file__)] + child)
+            try:
+                with open(result_path) as f:
+                    result = json.load(f)
+            except ValueError:
+                result = {'bots': count, 'error': f"run exited with code {code} and no result"}
+        finally:
+            os.remove(result_path)
+        report['runs'].append(result)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0 if all('error' not in run for run in report['runs']) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
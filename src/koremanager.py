@@ -1,22 +1,2701 @@
 import os
 import re
+import sys
+import signal
+import argparse
 import subprocess
 import threading
 import psutil
-import pystray
-from pystray import MenuItem as item
-from PIL import Image, ImageDraw
 import time
-import tkinter as tk
-from tkinter import ttk, messagebox, filedialog, simpledialog
 import json
+import functools
 from datetime import datetime
 import logging
-import queue
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait as wait_futures
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import itertools
+import heapq
+import random
+import select
+import struct
+import ctypes
+import ctypes.util
+import codecs
+import locale
+import selectors
+import gzip
+import bisect
+import mmap
+import csv
+import tracemalloc
+from array import array
+from types import MappingProxyType
+
+# GUI stack is imported on demand (load_tk_modules / load_tray_modules) so the
+# headless commands start fast and work on machines without a display.
+tk = ttk = messagebox = filedialog = simpledialog = None
+pystray = item = Image = ImageDraw = None
+
+# Only defined on Windows; elsewhere the bot simply has no console to hide
+CREATE_NO_WINDOW = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+
+def load_tk_modules():
+    global tk, ttk, messagebox, filedialog, simpledialog
+    if tk is not None:
+        return
+    import tkinter
+    from tkinter import ttk as _ttk, messagebox as _messagebox, filedialog as _filedialog, simpledialog as _simpledialog
+    ttk, messagebox, filedialog, simpledialog = _ttk, _messagebox, _filedialog, _simpledialog
+    tk = tkinter
+
+def load_tray_modules():
+    global pystray, item, Image, ImageDraw
+    if pystray is not None:
+        return
+    import pystray as _pystray
+    from PIL import Image as _Image, ImageDraw as _ImageDraw
+    item = _pystray.MenuItem
+    Image, ImageDraw = _Image, _ImageDraw
+    pystray = _pystray
+
+class ProcessSnapshot:
+    """One sweep of the host process table, shared by status, kill and terminal code"""
+    def __init__(self, taken_at, by_name, procs):
+        self.taken_at = taken_at
+        self.by_name = by_name  # lowercased process name -> [pid, ...]
+        self.procs = procs  # pid -> psutil.Process
+        self._located = {}  # lowercased process name -> locate() map
+
+    def age(self):
+        return time.time() - self.taken_at
+
+    def pids_for(self, name):
+        return self.by_name.get(name.lower(), [])
+
+    def add(self, name, pid, proc=None):
+        """Register a process launched after the sweep so it is visible right away"""
+        pids = self.by_name.setdefault(name.lower(), [])
+        if pid not in pids:
+            pids.append(pid)
+        if proc is not None:
+            self.procs[pid] = proc
+        self._located.pop(name.lower(), None)
+
+    def discard(self, name, pid=None):
+        """Forget every process called name, or only pid"""
+        self._located.pop(name.lower(), None)
+        if pid is None:
+            for pid in self.by_name.pop(name.lower(), []):
+                self.procs.pop(pid, None)
+            return
+        pids = self.by_name.get(name.lower(), [])
+        if pid in pids:
+            pids.remove(pid)
+        self.procs.pop(pid, None)
+
+    def locate(self, name, skip=None):
+        """{normcase(cwd) and normcase(exe) -> (pid, exe, cwd, proc)} for processes called name.
+
+        Built once per snapshot, so matching every bot against every process
+        queries each process once; PIDs for which skip(pid) is true are left out.
+        """
+        key = name.lower()
+        located = self._located.get(key)
+        if located is None:
+            located = {}
+            for pid in self.pids_for(name):
+                if skip is not None and skip(pid):
+                    continue
+                try:
+                    proc = self.procs.get(pid) or psutil.Process(pid)
+                    entry = (pid, proc.exe(), proc.cwd(), proc)
+                except psutil.Error:
+                    continue
+                located.setdefault(os.path.normcase(entry[2]), entry)
+                located.setdefault(os.path.normcase(entry[1]), entry)
+            self._located[key] = located
+        return located
+
+class BotIdentity:
+    """A launched bot process, told apart from a later process that reuses its PID"""
+    __slots__ = ('bot', 'pid', 'create_time', 'exe', 'cwd', 'handle')
+
+    def __init__(self, bot, pid, create_time, exe, cwd, handle):
+        self.bot = bot
+        self.pid = pid
+        self.create_time = create_time
+        self.exe = exe
+        self.cwd = cwd
+        self.handle = handle  # psutil.Process bound to (pid, create_time)
+
+class ProcessRegistry:
+    """Bots launched or adopted by this manager, indexed by bot and by PID.
+
+    Each identity is (PID, create_time, exe path, cwd) recorded at launch, so
+    ownership and liveness are dictionary lookups plus one query about that
+    single process, never a walk of the process table.
+    """
+    def __init__(self):
+        self.by_bot = {}
+        self.by_pid = {}
+        self._lock = threading.Lock()
+
+    def register(self, bot, pid, exe, cwd, handle=None):
+        """Record bot's process; raises psutil.Error if it is already gone"""
+        handle = handle or psutil.Process(pid)
+        identity = BotIdentity(bot, pid, handle.create_time(), exe, cwd, handle)
+        with self._lock:
+            previous = self.by_bot.get(bot)
+            if previous is not None:
+                self.by_pid.pop(previous.pid, None)
+            self.by_bot[bot] = identity
+            self.by_pid[pid] = identity
+        return identity
+
+    def get(self, bot):
+        return self.by_bot.get(bot)
+
+    def owner(self, pid):
+        identity = self.by_pid.get(pid)
+        return identity.bot if identity else None
+
+    def alive(self, bot):
+        """The bot's identity if its process still runs, else None"""
+        identity = self.by_bot.get(bot)
+        if identity is None:
+            return None
+        try:
+            # is_running() also compares create_time, so a reused PID reads as dead
+            if identity.handle.is_running() and identity.handle.status() != psutil.STATUS_ZOMBIE:
+                return identity
+        except psutil.Error:
+            pass
+        return None
+
+    def forget(self, bot, pid=None):
+        with self._lock:
+            identity = self.by_bot.get(bot)
+            if identity is None or (pid is not None and identity.pid != pid):
+                return None
+            del self.by_bot[bot]
+            self.by_pid.pop(identity.pid, None)
+            return identity
+
+class MetricsSampler:
+    """Samples CPU and RSS of running bots off the Tk thread and publishes the latest values"""
+    def __init__(self, manager, interval=1.0, shard_size=25, max_workers=4):
+        self.manager = manager
+        self.interval = interval
+        self.shard_size = shard_size  # bots per shard before the pool is used
+        self.max_workers = max_workers
+        self.handles = {}  # bot -> psutil.Process kept between samples for cpu deltas
+        self.metrics = {}  # bot -> {'pid', 'cpu', 'rss', 'ts'}, replaced atomically
+        self._stop = threading.Event()
+        self._thread = None
+        self._pool = None
+
+    def start(self):
+        if self.running():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._pool:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def get(self, bot_folder, pid=None):
+        sample = self.metrics.get(bot_folder)
+        if sample is None or (pid is not None and sample['pid'] != pid):
+            return None
+        return sample
+
+    def _run(self):
+        while not self._stop.is_set():
+            began = time.time()
+            try:
+                self.sample_once()
+                self.manager.hot_paths.observe('metrics_sample', time.time() - began)
+                self.manager.refresh_status_cache()
+                self.manager.histograms['status_refresh'].observe(time.time() - began)
+                self.manager.watchdog.check()
+            except Exception as e:
+                self.manager.logger.error(f"Error sampling bot metrics: {e}")
+            self._stop.wait(max(0.0, self.interval - (time.time() - began)))
+
+    def sample_once(self):
+        # Only the rename_exe compatibility mode needs a process-table sweep; the
+        # status refresh that follows adopts from it on the supervisor thread
+        self.manager.lookup_snapshot(force=True)
+        targets = {}
+        for bot_folder in list(self.manager.BOT_FOLDERS):
+            identity = self.manager.registry.alive(bot_folder)
+            if identity is not None:
+                targets[bot_folder] = identity.handle
+
+        # Drop handles of stopped bots or bots that came back with a new process;
+        # the registry's handle is kept between samples for cpu deltas
+        for bot_folder in list(self.handles):
+            if targets.get(bot_folder) is not self.handles[bot_folder]:
+                del self.handles[bot_folder]
+        self.handles.update(targets)
+
+        items = list(self.handles.items())
+        if len(items) <= self.shard_size:
+            metrics = self._sample_shard(items)
+        else:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix="metrics-shard")
+            shards = [items[i:i + self.shard_size] for i in range(0, len(items), self.shard_size)]
+            metrics = {}
+            for part in self._pool.map(self._sample_shard, shards):
+                metrics.update(part)
+        self.metrics = metrics
+        self.manager.metrics_history.record(metrics)
+
+    def _sample_shard(self, items):
+        result = {}
+        now = time.time()
+        for bot_folder, proc in items:
+            try:
+                with proc.oneshot():
+                    # interval=None: delta since the previous call on this handle, never blocks
+                    cpu = proc.cpu_percent(interval=None)
+                    rss = proc.memory_info().rss
+                    threads = proc.num_threads()
+                    try:
+                        io = proc.io_counters()
+                    except (AttributeError, psutil.AccessDenied):
+                        io = None  # not available on macOS
+            except psutil.Error:
+                continue
+            result[bot_folder] = {'pid': proc.pid, 'cpu': cpu, 'rss': rss, 'threads': threads,
+                                  'read_bytes': io.read_bytes if io else None,
+                                  'write_bytes': io.write_bytes if io else None, 'ts': now}
+        return result
+
+class SeriesRing:
+    """Fixed number of timestamped samples kept in typed arrays, oldest overwritten first"""
+    def __init__(self, step, capacity, fields):
+        self.step = step  # seconds between samples
+        self.capacity = capacity
+        self.fields = fields
+        self.ts = array('d', [0.0]) * capacity
+        self.columns = [array('d', [0.0]) * capacity for _ in fields]
+        self.head = 0  # next slot to write
+        self.count = 0
+
+    def add(self, ts, values):
+        slot = self.head
+        self.ts[slot] = ts
+        for column, value in zip(self.columns, values):
+            column[slot] = value
+        self.head = (slot + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def oldest(self):
+        if not self.count:
+            return None
+        return self.ts[(self.head - self.count) % self.capacity]
+
+    def rows(self, start=None, end=None):
+        """(ts, *values) tuples in time order, optionally limited to [start, end]"""
+        first = (self.head - self.count) % self.capacity
+        rows = []
+        for i in range(self.count):
+            slot = (first + i) % self.capacity
+            ts = self.ts[slot]
+            if (start is None or ts >= start) and (end is None or ts <= end):
+                rows.append((ts,) + tuple(column[slot] for column in self.columns))
+        return rows
+
+    def last(self, field, count):
+        column = self.columns[self.fields.index(field)]
+        count = min(count, self.count)
+        return [column[(self.head - count + i) % self.capacity] for i in range(count)]
+
+class BotHistory:
+    """Resource history of one bot in 1 s / 1 min / 1 h tiers.
+
+    Every sample goes into the 1 s ring; the coarser rings get the average of
+    each minute or hour once it is complete. All rings are preallocated, so
+    the memory used per bot never grows.
+    """
+    FIELDS = ('cpu', 'rss', 'threads', 'read_bps', 'write_bps')
+    TIERS = ((1, 900), (60, 1440), (3600, 720))  # (step, samples): 15 minutes, 1 day, 30 days
+
+    def __init__(self):
+        self.tiers = [SeriesRing(step, capacity, self.FIELDS) for step, capacity in self.TIERS]
+        self._open = [None] * len(self.tiers)  # per coarse tier: [bucket, count, sums]
+        self._last_io = None  # (ts, read_bytes, write_bytes) for the I/O rates
+
+    def add(self, ts, cpu, rss, threads, read_bytes=None, write_bytes=None):
+        read_bps = write_bps = 0.0
+        if read_bytes is not None and write_bytes is not None:
+            last = self._last_io
+            # Counters restart with the process, so a drop means a new PID
+            if last and ts > last[0] and read_bytes >= last[1] and write_bytes >= last[2]:
+                read_bps = (read_bytes - last[1]) / (ts - last[0])
+                write_bps = (write_bytes - last[2]) / (ts - last[0])
+            self._last_io = (ts, read_bytes, write_bytes)
+        values = (cpu, rss, threads, read_bps, write_bps)
+        self.tiers[0].add(ts, values)
+        for index in range(1, len(self.tiers)):
+            ring = self.tiers[index]
+            bucket = int(ts // ring.step)
+            pending = self._open[index]
+            if pending is not None and pending[0] != bucket:
+                ring.add(pending[0] * ring.step, [total / pending[1] for total in pending[2]])
+                pending = None
+            if pending is None:
+                pending = self._open[index] = [bucket, 0, [0.0] * len(values)]
+            pending[1] += 1
+            pending[2] = [total + value for total, value in zip(pending[2], values)]
+
+    def rows(self, start=None, end=None):
+        """Rows in [start, end], each stretch taken from the finest tier that has it.
+
+        Coarser tiers only fill in what is older than the finer ones reach,
+        so a young bot keeps its 1 s detail.
+        """
+        stretches = []
+        covered = None  # finer tiers have everything from here on
+        for ring in self.tiers:
+            oldest = ring.oldest()
+            if oldest is None or (covered is not None and oldest >= covered):
+                continue
+            rows = ring.rows(start, end)
+            if covered is not None:
+                rows = [row for row in rows if row[0] < covered]
+            stretches.append(rows)
+            covered = oldest
+            if start is not None and oldest <= start:
+                break
+        return [row for rows in reversed(stretches) for row in rows]
+
+class MetricsHistory:
+    """BotHistory per bot, fed by the MetricsSampler"""
+    def __init__(self):
+        self.bots = {}  # bot -> BotHistory
+        self._lock = threading.Lock()
+
+    def record(self, metrics):
+        with self._lock:
+            for bot_folder, sample in metrics.items():
+                history = self.bots.get(bot_folder)
+                if history is None:
+                    history = self.bots[bot_folder] = BotHistory()
+                history.add(sample['ts'], sample['cpu'], sample['rss'], sample.get('threads', 0),
+                            sample.get('read_bytes'), sample.get('write_bytes'))
+
+    def rows(self, bot_folder, start=None, end=None):
+        with self._lock:
+            history = self.bots.get(bot_folder)
+            return history.rows(start, end) if history else []
+
+    def last(self, bot_folder, field, count, tier=0):
+        with self._lock:
+            history = self.bots.get(bot_folder)
+            return history.tiers[tier].last(field, count) if history else []
+
+    def export_csv(self, path, bots, start=None, end=None):
+        """Write the rows of bots in [start, end] to path; returns the number of rows"""
+        written = 0
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(('bot', 'timestamp', 'time') + BotHistory.FIELDS)
+            for bot_folder in bots:
+                for row in self.rows(bot_folder, start, end):
+                    writer.writerow((bot_folder, f"{row[0]:.0f}", datetime.fromtimestamp(row[0]).strftime("%Y-%m-%d %H:%M:%S"))
+                                    + tuple(f"{value:g}" for value in row[1:]))
+                    written += 1
+        return written
+
+class Watchdog:
+    """Liveness probes that restart hung bots instead of waiting for their timer.
+
+    A running bot is unhealthy when its logs/console.txt stops changing, when
+    its CPU stays at 0% or when a configured log pattern stops appearing, each
+    for longer than its limit. A limit of 0 turns that probe off, and every
+    start gets a grace period. Checked from the metrics sampler's loop.
+    """
+    DEFAULTS = {
+        "grace_seconds": 120,
+        "log_stale_seconds": 300,
+        "cpu_idle_seconds": 600,
+        "cpu_idle_percent": 0.0,  # CPU at or below this counts as idle
+        "log_pattern": "",
+        "pattern_seconds": 600
+    }
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.states = {}  # bot -> probe state for its current PID
+        self.restarts = defaultdict(int)  # bot -> restarts triggered by the watchdog
+        self.last_check = 0.0
+
+    def settings(self, bot_folder):
+        config = self.manager.config
+        settings = {key: config.get(f"watchdog_{key}", default) for key, default in self.DEFAULTS.items()}
+        settings.update(config.get("watchdog_overrides", {}).get(bot_folder, {}))
+        return settings
+
+    def health(self, bot_folder):
+        state = self.states.get(bot_folder)
+        return state['health'] if state else None
+
+    def check(self, now=None):
+        now = time.time() if now is None else now
+        config = self.manager.config
+        if not config.get("watchdog_enabled", False):
+            for bot_folder in list(self.states):
+                self._forget(bot_folder)
+            return
+        if now - self.last_check < config.get("watchdog_interval", 5):
+            return
+        self.last_check = now
+        bots = self.manager.supervisor.snapshot.bots
+        for bot_folder in list(self.manager.BOT_FOLDERS):
+            info = bots.get(bot_folder)
+            pid = info['pid'] if info else None
+            started = info['started'] if info else None
+            state = self.states.get(bot_folder)
+            if state is not None and state['pid'] != pid:
+                self._forget(bot_folder)
+                state = None
+            if not pid or started is None:
+                continue
+            if state is not None and state['restarting'] is not None:
+                if now - state['restarting'] < state['settings']["grace_seconds"]:
+                    continue
+                # The restart didn't replace the process: probe it again from scratch
+                self._forget(bot_folder)
+                state = None
+            if state is None:
+                state = self._watch(bot_folder, pid, started)
+            reason = self._probe(bot_folder, state, now)
+            if reason is None:
+                continue
+            state['health'] = reason
+            state['restarting'] = now
+            self.restarts[bot_folder] += 1
+            self.manager.logger.warning(f"Watchdog: bot {bot_folder} is unhealthy ({reason}), restarting")
+            self.manager.submit_job('restart', [bot_folder])
+
+    def _watch(self, bot_folder, pid, started):
+        settings = self.settings(bot_folder)
+        state = {
+            'pid': pid,
+            'started': started,
+            'settings': settings,
+            'health': 'starting',
+            'restarting': None,  # when a restart was requested
+            'log_signature': None,
+            'log_at': started,  # last time console.txt changed
+            'cpu_at': started,  # last sample above cpu_idle_percent
+            'cpu_seen': started,  # newest history sample already looked at
+            'pattern_at': started,  # last line matching log_pattern
+            'token': None
+        }
+        pattern = settings.get("log_pattern")
+        if pattern and settings.get("pattern_seconds"):
+            try:
+                regex = re.compile(pattern, re.IGNORECASE)
+            except re.error as e:
+                self.manager.logger.error(f"Watchdog: invalid log pattern for {bot_folder}: {e}")
+            else:
+                def seen(lines):
+                    if any(regex.search(line) for line in lines):
+                        state['pattern_at'] = time.time()
+                state['token'] = self.manager.log_tailer.subscribe(self._log_path(bot_folder), seen)
+        self.states[bot_folder] = state
+        return state
+
+    def _forget(self, bot_folder):
+        state = self.states.pop(bot_folder, None)
+        if state and state['token'] is not None:
+            self.manager.log_tailer.unsubscribe(state['token'])
+
+    def _log_path(self, bot_folder):
+        return os.path.join(self.manager.BASE_DIR, bot_folder, "logs", "console.txt")
+
+    def _probe(self, bot_folder, state, now):
+        """Update the bot's activity marks; return why it is unhealthy, or None"""
+        settings = state['settings']
+        try:
+            st = os.stat(self._log_path(bot_folder))
+            signature = (st.st_mtime, st.st_size)
+        except OSError:
+            signature = None
+        if signature is not None and signature != state['log_signature']:
+            state['log_signature'] = signature
+            state['log_at'] = now
+        for row in self.manager.metrics_history.rows(bot_folder, state['cpu_seen']):
+            if row[0] > state['cpu_seen']:
+                state['cpu_seen'] = row[0]
+                if row[1] > settings["cpu_idle_percent"]:
+                    state['cpu_at'] = row[0]
+
+        if now - state['started'] < settings["grace_seconds"]:
+            return None
+        state['health'] = 'ok'
+        limit = settings["log_stale_seconds"]
+        if limit and now - state['log_at'] > limit:
+            return f"console.txt unchanged for {int(now - state['log_at'])}s"
+        limit = settings["cpu_idle_seconds"]
+        if limit and now - state['cpu_at'] > limit:
+            return f"CPU idle for {int(now - state['cpu_at'])}s"
+        limit = settings["pattern_seconds"]
+        if limit and state['token'] is not None and now - state['pattern_at'] > limit:
+            return f"no '{settings['log_pattern']}' in console.txt for {int(now - state['pattern_at'])}s"
+        return None
+
+def sparkline(values, floor=None, blocks="▁▂▃▄▅▆▇█"):
+    """Render values as block characters scaled between floor (default: their minimum) and their maximum"""
+    if not values:
+        return "-"
+    low = min(values) if floor is None else floor
+    span = max(values) - low
+    if span <= 0:
+        return blocks[0] * len(values)
+    return "".join(blocks[min(len(blocks) - 1, max(0, int((value - low) / span * (len(blocks) - 1))))] for value in values)
+
+def parse_windows(specs):
+    """Parse daily windows like "02:00-06:00" (may wrap midnight) into minute ranges.
+
+    Raises ValueError naming the first malformed entry.
+    """
+    windows = []
+    for spec in specs or []:
+        try:
+            start, end = spec.split('-')
+            sh, sm = (int(x) for x in start.strip().split(':'))
+            eh, em = (int(x) for x in end.strip().split(':'))
+            if not (0 <= sh <= 24 and 0 <= eh <= 24 and 0 <= sm < 60 and 0 <= em < 60):
+                raise ValueError
+        except (ValueError, AttributeError):
+            raise ValueError(f"invalid restart window {spec!r}, expected HH:MM-HH:MM") from None
+        windows.append((sh * 60 + sm, eh * 60 + em))
+    return windows
+
+def next_in_windows(ts, windows):
+    """Earliest timestamp >= ts that falls inside one of the daily windows"""
+    if not windows:
+        return ts
+    base = datetime.fromtimestamp(ts)
+    midnight = base.replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    minute = (ts - midnight) / 60
+    for start, end in windows:
+        inside = start <= minute < end if start < end else (minute >= start or minute < end)
+        if inside:
+            return ts
+    best = None
+    for day in range(2):
+        for start, end in windows:
+            candidate = midnight + day * 86400 + start * 60
+            if candidate >= ts and (best is None or candidate < best):
+                best = candidate
+    return best if best is not None else ts
+
+class Scheduler:
+    """One thread running delayed callbacks from a heap, replacing per-bot Timers.
+
+    Entries are keyed ("restart:<bot>", "rename:<bot>"); scheduling a key
+    again replaces it and cancel is a dict pop, the stale heap item is
+    skipped when it surfaces.
+    """
+    def __init__(self, logger):
+        self.logger = logger
+        self._heap = []  # (due, seq, key)
+        self._entries = {}  # key -> (due, seq, callback, label)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+            self._thread.start()
+
+    def schedule_at(self, key, due, callback, label=""):
+        with self._cond:
+            seq = next(self._seq)
+            self._entries[key] = (due, seq, callback, label)
+            heapq.heappush(self._heap, (due, seq, key))
+            # Keep lazily-deleted items from piling up
+            if len(self._heap) > 2 * len(self._entries) + 64:
+                self._heap = [(d, s, k) for k, (d, s, _, _) in self._entries.items()]
+                heapq.heapify(self._heap)
+            self._cond.notify()
+        self._ensure_thread()
+
+    def schedule(self, key, delay, callback, label=""):
+        self.schedule_at(key, time.time() + delay, callback, label)
+
+    def cancel(self, key):
+        with self._cond:
+            return self._entries.pop(key, None) is not None
+
+    def due(self, key):
+        entry = self._entries.get(key)
+        return entry[0] if entry else None
+
+    def pending(self, prefix=""):
+        """[(due, key, label)] sorted by due time"""
+        with self._cond:
+            items = [(due, key, label) for key, (due, _, _, label) in self._entries.items()
+                     if key.startswith(prefix)]
+        return sorted(items)
+
+    def wait_idle(self, prefix="", timeout=None):
+        """Block until no entry with the prefix is pending"""
+        deadline = None if timeout is None else time.time() + timeout
+        while self.pending(prefix):
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(0.1)
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    while self._heap:
+                        due, seq, key = self._heap[0]
+                        entry = self._entries.get(key)
+                        if entry is not None and entry[1] == seq:
+                            break
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    delay = self._heap[0][0] - time.time()
+                    if delay <= 0:
+                        break
+                    self._cond.wait(delay)
+                due, seq, key = heapq.heappop(self._heap)
+                _, _, callback, _ = self._entries.pop(key)
+            try:
+                callback()
+            except Exception as e:
+                self.logger.error(f"Scheduled task {key} failed: {e}")
+
+class StatusSnapshot:
+    """One published, read-only view of every bot's status.
+
+    The version goes up only when the status actually changed, so a consumer
+    remembers the version it last rendered and skips the work while it holds.
+    """
+    __slots__ = ('version', 'ts', 'bots', 'json')
+
+    def __init__(self, version, ts, bots):
+        self.version = version
+        self.ts = ts
+        # Serialized once here for the API, before the dicts are frozen
+        self.json = json.dumps({'version': version, 'ts': ts, 'bots': bots}).encode("utf-8")
+        self.bots = MappingProxyType({bot: MappingProxyType(info) for bot, info in bots.items()})
+
+class Supervisor:
+    """One worker thread that applies every change to the bots' state, in order.
+
+    Start, kill, exit handling, rescheduling and status refreshes are queued
+    as commands and run one at a time, so the manager's state dicts have a
+    single writer. After commands ran, the status is rebuilt at most once per
+    publish_interval and published as a new StatusSnapshot if it differs: a
+    bulk start of 500 bots yields a handful of snapshots, not 500.
+    """
+    def __init__(self, logger, build_status, publish_interval=0.2):
+        self.logger = logger
+        self.build_status = build_status  # (process snapshot or None) -> {bot: info}; runs on the worker
+        self.publish_interval = publish_interval
+        self.snapshot = StatusSnapshot(0, 0.0, {})
+        self._status = {}  # plain copy of the last published status, for comparing
+        self._commands = deque()
+        self._cond = threading.Condition()
+        self._listeners = []
+        self._thread = None
+        self._dirty = False
+        self._published_at = 0.0
+
+    def _ensure_thread(self):
+        # Caller holds self._cond: two first submits must never start two workers
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="supervisor", daemon=True)
+            self._thread.start()
+
+    def on_worker(self):
+        return threading.current_thread() is self._thread
+
+    def submit(self, label, func, *args, **kwargs):
+        """Queue func as a command and return a Future of its result"""
+        future = Future()
+        with self._cond:
+            self._commands.append((label, func, args, kwargs, future))
+            self._ensure_thread()
+            self._cond.notify()
+        return future
+
+    def call(self, label, func, *args, **kwargs):
+        """Run func as a command and wait for it; inline when already on the worker"""
+        if self.on_worker():
+            return func(*args, **kwargs)
+        return self.submit(label, func, *args, **kwargs).result()
+
+    def subscribe(self, callback):
+        """callback(snapshot) runs on the worker after every new version; keep it short"""
+        self._listeners.append(callback)
+
+    def publish(self, proc_snapshot=None):
+        """Rebuild the status and publish it if it changed; worker only"""
+        self._dirty = False
+        self._published_at = time.time()
+        status = self.build_status(proc_snapshot)
+        if status == self._status:
+            return self.snapshot
+        self._status = status
+        self.snapshot = StatusSnapshot(self.snapshot.version + 1, self._published_at, status)
+        for callback in list(self._listeners):
+            try:
+                callback(self.snapshot)
+            except Exception as e:
+                self.logger.error(f"Status listener failed: {e}")
+        return self.snapshot
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    delay = self._published_at + self.publish_interval - time.time() if self._dirty else None
+                    if self._commands or (delay is not None and delay <= 0):
+                        break
+                    self._cond.wait(delay)
+                command = None if delay is not None and delay <= 0 else self._commands.popleft()
+            if command is None:
+                try:
+                    self.publish()
+                except Exception as e:
+                    self.logger.error(f"Error publishing bot status: {e}")
+                continue
+            label, func, args, kwargs, future = command
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args, **kwargs))
+            except Exception as e:
+                self.logger.error(f"Supervisor command {label} failed: {e}")
+                future.set_exception(e)
+            if func != self.publish:
+                self._dirty = True
+
+def supervised(method):
+    """Run a BotManager method as a command on the manager's supervisor thread"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        return self.supervisor.call(method.__name__, method, self, *args, **kwargs)
+    return wrapper
+
+class Inotify:
+    """Minimal ctypes wrapper over Linux inotify, watching directories"""
+    IN_MODIFY = 0x002
+    IN_ATTRIB = 0x004
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    DIR_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    @classmethod
+    def create(cls):
+        """Return an Inotify instance, or None where inotify is not available"""
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            return cls()
+        except (OSError, AttributeError):
+            return None
+
+    def fileno(self):
+        return self.fd
+
+    def add_watch(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), self.DIR_MASK)
+        return wd if wd >= 0 else None
+
+    def rm_watch(self, wd):
+        self.libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self):
+        """[(wd, mask, name)] for every queued event"""
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset + 16 <= len(data):
+                wd, mask, cookie, length = struct.unpack_from("iIII", data, offset)
+                name = data[offset + 16:offset + 16 + length].rstrip(b"\0")
+                events.append((wd, mask, os.fsdecode(name)))
+                offset += 16 + length
+        return events
+
+class FollowedFile:
+    """Read position of one followed file, shared by every subscriber of that path"""
+    def __init__(self, path):
+        self.path = path
+        self.subscribers = {}  # token -> callback(lines)
+        self.offset = 0
+        self.ident = None  # (st_dev, st_ino) of the file the offset belongs to
+        self.partial = b""
+        self.wd = None
+        try:
+            st = os.stat(path)
+            self.offset = st.st_size  # start from the end, like tail -f
+            self.ident = (st.st_dev, st.st_ino)
+        except OSError:
+            pass
+
+    def poll(self, max_bytes=1024 * 1024):
+        """Return complete lines appended since the last poll"""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return []
+        ident = (st.st_dev, st.st_ino)
+        if ident != self.ident:
+            # Rotated or recreated: the new file is read from its start
+            self.ident = ident
+            self.offset = 0
+            self.partial = b""
+        elif st.st_size < self.offset:
+            # Truncated in place (e.g. reset_bot_log)
+            self.offset = 0
+            self.partial = b""
+        if st.st_size == self.offset:
+            return []
+
+        # Open per read so the bot stays free to rotate or delete the file
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(min(st.st_size - self.offset, max_bytes))
+        self.offset += len(data)
+        chunks = (self.partial + data).split(b"\n")
+        self.partial = chunks.pop()
+        return [chunk.rstrip(b"\r").decode("utf-8", errors="replace") for chunk in chunks]
+
+def read_last_lines(path, count, end=None, block_size=8192):
+    """Return (last count complete lines before end, offset just past them).
+
+    Reads backward in blocks, so the cost depends on count, not the file size.
+    An unterminated last line is left out; the offset points at its start.
+    """
+    with open(path, "rb") as f:
+        if end is None:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+        position = end
+        data = b""
+        while position > 0 and data.count(b"\n") <= count:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    cut = data.rfind(b"\n")
+    if cut < 0:
+        return [], end - len(data)
+    offset = end - len(data) + cut + 1
+    chunks = data[:cut].split(b"\n")
+    if position > 0:
+        chunks = chunks[1:]  # the first chunk may be a partial line
+    return [chunk.rstrip(b"\r").decode("utf-8", errors="replace") for chunk in chunks[-count:]], offset
+
+class LogTailer:
+    """One thread following any number of files for any number of subscribers.
+
+    Uses inotify on the files' directories where available and falls back to
+    stat polling; each path is read once no matter how many subscribers follow it.
+    """
+    def __init__(self, logger, poll_interval=0.25, safety_interval=2.0, stats=None):
+        self.logger = logger
+        self.stats = stats  # HotPathStats for the per-file delivery time
+        self.poll_interval = poll_interval
+        self.safety_interval = safety_interval  # full stat sweep even with inotify
+        self._files = {}  # path -> FollowedFile
+        self._tokens = {}  # token -> path
+        self._dirs = {}  # wd -> set of paths in that directory
+        self._token_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._inotify = Inotify.create()
+
+    def subscribe(self, path, callback):
+        path = os.path.abspath(path)
+        with self._lock:
+            token = next(self._token_ids)
+            followed = self._files.get(path)
+            if followed is None:
+                followed = FollowedFile(path)
+                self._files[path] = followed
+                self._watch(followed)
+            followed.subscribers[token] = callback
+            self._tokens[token] = path
+            # Under the lock: two loops would poll the same offsets and deliver lines twice
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="log-tailer", daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return token
+
+    def unsubscribe(self, token):
+        with self._lock:
+            path = self._tokens.pop(token, None)
+            followed = self._files.get(path)
+            if followed is None:
+                return
+            followed.subscribers.pop(token, None)
+            if not followed.subscribers:
+                del self._files[path]
+                self._unwatch(followed)
+
+    def _watch(self, followed):
+        if self._inotify is None:
+            return
+        wd = self._inotify.add_watch(os.path.dirname(followed.path))
+        if wd is not None:
+            followed.wd = wd
+            self._dirs.setdefault(wd, set()).add(followed.path)
+
+    def _unwatch(self, followed):
+        if followed.wd is None:
+            return
+        paths = self._dirs.get(followed.wd, set())
+        paths.discard(followed.path)
+        if not paths:
+            self._dirs.pop(followed.wd, None)
+            self._inotify.rm_watch(followed.wd)
+
+    def _deliver(self, followed):
+        began = time.perf_counter()
+        try:
+            lines = followed.poll()
+        except OSError as e:
+            self.logger.error(f"Error tailing {followed.path}: {e}")
+            return
+        if not lines:
+            return
+        for callback in list(followed.subscribers.values()):
+            try:
+                callback(lines)
+            except Exception as e:
+                self.logger.error(f"Error delivering lines from {followed.path}: {e}")
+        if self.stats is not None:
+            self.stats.observe('log_tail', time.perf_counter() - began)
+
+    def _wait(self, timeout):
+        """Wait for inotify activity or a wake-up; return the paths that changed"""
+        if self._inotify is None:
+            self._wake.wait(timeout)
+            self._wake.clear()
+            return None
+        ready, _, _ = select.select([self._inotify], [], [], timeout)
+        self._wake.clear()
+        if not ready:
+            return set()
+        changed = set()
+        with self._lock:
+            for wd, mask, name in self._inotify.read_events():
+                for path in self._dirs.get(wd, ()):
+                    if os.path.basename(path) == name:
+                        changed.add(path)
+        return changed
+
+    def _run(self):
+        last_sweep = 0.0
+        while True:
+            with self._lock:
+                files = dict(self._files)
+            unwatched = any(f.wd is None for f in files.values())
+            if self._inotify is None or unwatched:
+                timeout = self.poll_interval
+            else:
+                timeout = self.safety_interval
+            try:
+                changed = self._wait(timeout)
+            except (OSError, ValueError) as e:
+                self.logger.error(f"Log tailer wait failed, falling back to polling: {e}")
+                self._inotify = None
+                changed = None
+
+            now = time.monotonic()
+            with self._lock:
+                files = dict(self._files)
+            if changed is None or now - last_sweep >= self.safety_interval:
+                targets = files.values()
+                last_sweep = now
+            else:
+                # inotify: changed files, plus anything whose directory isn't watched
+                targets = [f for path, f in files.items() if path in changed or f.wd is None]
+            for followed in targets:
+                self._deliver(followed)
+
+class OutputRing:
+    """Fixed-capacity buffer of one bot's output, bounded in lines and bytes.
+
+    Lines get increasing sequence numbers; every reader keeps its own
+    OutputCursor, so readers never share or steal lines from each other.
+    """
+    def __init__(self, max_lines=1000, max_bytes=256 * 1024):
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self.lines = deque()
+        self.bytes = 0
+        self.next_seq = 0  # sequence number the next appended line gets
+        self.evicted = 0  # lines pushed out by the size limits so far
+        self.lock = threading.Lock()
+
+    def append(self, line):
+        with self.lock:
+            self.lines.append(line)
+            self.bytes += len(line)
+            self.next_seq += 1
+            while len(self.lines) > self.max_lines or (self.bytes > self.max_bytes and len(self.lines) > 1):
+                self.bytes -= len(self.lines.popleft())
+                self.evicted += 1
+
+    def cursor(self, from_start=True):
+        with self.lock:
+            # An append between reading next_seq and len(lines) would skew the start
+            seq = self.next_seq - len(self.lines) if from_start else self.next_seq
+        return OutputCursor(self, seq)
+
+    def read_from(self, seq):
+        """(lines since seq, next seq, lines missed because they were evicted)"""
+        with self.lock:
+            first = self.next_seq - len(self.lines)
+            missed = max(0, first - seq)
+            count = self.next_seq - max(seq, first)
+            # Walk from the right end: cost is the number of new lines only
+            lines = list(itertools.islice(reversed(self.lines), count))
+            lines.reverse()
+            return lines, self.next_seq, missed
+
+    def __len__(self):
+        return len(self.lines)
+
+class OutputCursor:
+    """One reader's position in an OutputRing"""
+    def __init__(self, ring, seq):
+        self.ring = ring
+        self.seq = seq
+        self.dropped = 0  # lines this reader never saw
+
+    def read(self):
+        lines, self.seq, missed = self.ring.read_from(self.seq)
+        self.dropped += missed
+        return lines
+
+class PipeStream:
+    """Decoder state for one bot pipe: splits raw chunks into lines"""
+    def __init__(self, bot_folder, process, encoding, on_lines, on_eof=None, max_line=64 * 1024):
+        self.bot_folder = bot_folder
+        self.process = process
+        self.fd = process.stdout.fileno()
+        self.decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self.partial = ""
+        self.on_lines = on_lines
+        self.on_eof = on_eof
+        self.max_line = max_line
+
+    def feed(self, data):
+        text = self.partial + self.decoder.decode(data)
+        lines = text.split("\n")
+        self.partial = lines.pop()
+        if len(self.partial) > self.max_line:
+            # A runaway line without newline: flush it rather than grow forever
+            lines.append(self.partial)
+            self.partial = ""
+        if lines:
+            self.on_lines(lines)
+
+    def finish(self):
+        rest = self.partial + self.decoder.decode(b"", final=True)
+        self.partial = ""
+        if rest:
+            self.on_lines([rest])
+        try:
+            self.process.stdout.close()
+        except OSError:
+            pass
+        if self.on_eof:
+            self.on_eof()
+
+class OutputMultiplexer:
+    """Reads every captured bot pipe from one thread, in large non-blocking chunks.
+
+    POSIX waits on a selector; Windows pipes can't be selected, so there the
+    same thread polls them with PeekNamedPipe and only reads what is there.
+    """
+    def __init__(self, logger, chunk_size=64 * 1024, poll_interval=0.05, stats=None):
+        self.logger = logger
+        self.stats = stats  # HotPathStats for the per-chunk decode and capture time
+        self.chunk_size = chunk_size
+        self.poll_interval = poll_interval
+        self._streams = {}  # fd -> PipeStream, owned by the loop thread
+        self._incoming = deque()  # streams waiting to be picked up by the loop
+        self._thread = None
+        self._lock = threading.Lock()  # add() runs on several bulk pool threads at once
+        self._windows = os.name == "nt"
+        if not self._windows:
+            self._selector = selectors.DefaultSelector()
+            self._wake_r, self._wake_w = os.pipe()
+            os.set_blocking(self._wake_r, False)
+            self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+
+    def add(self, stream):
+        if not self._windows:
+            os.set_blocking(stream.fd, False)
+        with self._lock:
+            self._incoming.append(stream)
+            # Two loops on one selector would feed the same stream concurrently
+            if self._thread is None or not self._thread.is_alive():
+                target = self._run_windows if self._windows else self._run_posix
+                self._thread = threading.Thread(target=target, name="output-mux", daemon=True)
+                self._thread.start()
+                return
+        if not self._windows:
+            os.write(self._wake_w, b"x")
+
+    def stream_count(self):
+        return len(self._streams) + len(self._incoming)
+
+    def _accept(self):
+        while self._incoming:
+            stream = self._incoming.popleft()
+            self._streams[stream.fd] = stream
+            if not self._windows:
+                self._selector.register(stream.fd, selectors.EVENT_READ, stream)
+
+    def _close(self, stream):
+        self._streams.pop(stream.fd, None)
+        if not self._windows:
+            try:
+                self._selector.unregister(stream.fd)
+            except (KeyError, ValueError):
+                pass
+        try:
+            stream.finish()
+        except Exception as e:
+            self.logger.error(f"Error closing output of {stream.bot_folder}: {e}")
+
+    def _feed(self, stream, data):
+        began = time.perf_counter()
+        try:
+            stream.feed(data)
+        except Exception as e:
+            self.logger.error(f"Error capturing output for {stream.bot_folder}: {e}")
+        if self.stats is not None:
+            self.stats.observe('output_capture', time.perf_counter() - began)
+
+    def _run_posix(self):
+        while True:
+            self._accept()
+            for key, _ in self._selector.select():
+                if key.data is None:
+                    try:
+                        os.read(self._wake_r, 4096)
+                    except BlockingIOError:
+                        pass
+                    continue
+                stream = key.data
+                try:
+                    data = os.read(stream.fd, self.chunk_size)
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    data = b""
+                if data:
+                    self._feed(stream, data)
+                else:
+                    self._close(stream)
+
+    def _run_windows(self):
+        import msvcrt
+        from ctypes import wintypes
+        peek = ctypes.windll.kernel32.PeekNamedPipe
+        available = wintypes.DWORD()
+        while True:
+            self._accept()
+            busy = False
+            for stream in list(self._streams.values()):
+                handle = msvcrt.get_osfhandle(stream.fd)
+                if not peek(handle, None, 0, None, ctypes.byref(available), None):
+                    self._close(stream)  # broken pipe: the bot exited
+                    continue
+                if available.value:
+                    busy = True
+                    self._feed(stream, os.read(stream.fd, min(available.value, self.chunk_size)))
+            if not busy:
+                time.sleep(self.poll_interval)
+
+class ArchiveSegment:
+    """The segment file a bot is currently writing, plus its time index.
+
+    Files are named by start time in milliseconds, moved on by one while the
+    name is taken, so a segment never reopens an earlier one.
+    """
+    def __init__(self, directory, started):
+        self.started = started
+        stamp = int(started * 1000)
+        while any(os.path.exists(os.path.join(directory, f"{stamp}{suffix}")) for suffix in (".log", ".log.gz", ".idx")):
+            stamp += 1
+        self.log_path = os.path.join(directory, f"{stamp}.log")
+        self.idx_path = os.path.join(directory, f"{stamp}.idx")
+        self.file = open(self.log_path, "ab")
+        self.size = self.file.tell()
+        self.last_indexed = None
+
+class OutputArchive:
+    """Writes captured output to rotated, compressed per-bot segment files.
+
+    Lines are buffered in memory and written by one thread once per flush
+    interval, so the archive costs one write per bot per flush. Each segment
+    has an .idx file of "timestamp raw_offset [compressed_offset]" rows.
+    Closed segments are compressed in the background one gzip member per
+    indexed block, so a time range is read by decompressing only the
+    blocks it touches.
+    """
+    def __init__(self, logger, directory, segment_bytes=8 * 1024 * 1024, segment_seconds=3600,
+                 flush_interval=1.0, index_every=10.0, max_segments=48):
+        self.logger = logger
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.flush_interval = flush_interval
+        self.index_every = index_every  # seconds between index rows
+        self.max_segments = max_segments  # per bot, oldest deleted first
+        self._buffers = {}  # bot -> [(ts, line)]
+        self._segments = {}  # bot -> ArchiveSegment, writer thread only
+        self._recovered = set()  # bots whose leftover segments were already queued
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # flush() may also be called by readers
+        self._swap_lock = threading.Lock()  # a compressed segment's .gz/.idx/.log swap vs readers
+        self._stop = threading.Event()
+        self._compressor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="archive-gzip")
+        self._thread = threading.Thread(target=self._run, name="archive", daemon=True)
+        self._thread.start()
+
+    def append(self, bot_folder, ts, lines):
+        with self._lock:
+            self._buffers.setdefault(bot_folder, []).extend((ts, line) for line in lines)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=5)
+        with self._write_lock:
+            for bot_folder in list(self._segments):
+                self._rotate(bot_folder)
+        self._compressor.shutdown(wait=True)
+
+    def bot_dir(self, bot_folder):
+        return os.path.join(self.directory, bot_folder)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                buffers, self._buffers = self._buffers, {}
+            for bot_folder, entries in buffers.items():
+                try:
+                    self._write(bot_folder, entries)
+                except OSError as e:
+                    self.logger.error(f"Error archiving output for {bot_folder}: {e}")
+
+    def _write(self, bot_folder, entries):
+        segment = self._segments.get(bot_folder)
+        now = entries[0][0]
+        if segment is None:
+            os.makedirs(self.bot_dir(bot_folder), exist_ok=True)
+            if bot_folder not in self._recovered:
+                # Segments left over from an earlier run are closed now
+                self._recovered.add(bot_folder)
+                for name in os.listdir(self.bot_dir(bot_folder)):
+                    if name.endswith(".log"):
+                        self._compressor.submit(self._compress, os.path.join(self.bot_dir(bot_folder), name))
+            segment = ArchiveSegment(self.bot_dir(bot_folder), now)
+            self._segments[bot_folder] = segment
+
+        data = "".join(f"{ts:.3f} {line}\n" for ts, line in entries).encode("utf-8", errors="replace")
+        if segment.last_indexed is None or now - segment.last_indexed >= self.index_every:
+            with open(segment.idx_path, "a") as idx:
+                idx.write(f"{now:.3f}\t{segment.size}\n")
+            segment.last_indexed = now
+        segment.file.write(data)
+        segment.file.flush()
+        segment.size += len(data)
+
+        if segment.size >= self.segment_bytes or now - segment.started >= self.segment_seconds:
+            self._rotate(bot_folder)
+
+    def _rotate(self, bot_folder):
+        segment = self._segments.pop(bot_folder, None)
+        if segment is None:
+            return
+        segment.file.close()
+        self._compressor.submit(self._compress, segment.log_path)
+        self._compressor.submit(self._prune, bot_folder)
+
+    def _compress(self, log_path):
+        idx_path = self._index_path(log_path)
+        gz_path = log_path + ".gz"
+        try:
+            rows = self._read_index(idx_path)
+            size = os.path.getsize(log_path)
+            if not rows or rows[0][1] != 0:
+                rows.insert(0, (rows[0][0] if rows else os.path.getmtime(log_path), 0, None))
+            bounds = [row[1] for row in rows] + [size]
+            compressed = []
+            with open(log_path, "rb") as src, open(gz_path + ".tmp", "wb") as dst:
+                for i, (ts, offset, _) in enumerate(rows):
+                    src.seek(offset)
+                    block = src.read(bounds[i + 1] - offset)
+                    compressed.append((ts, offset, dst.tell()))
+                    # Every block is its own gzip member: the file stays a valid .gz
+                    dst.write(gzip.compress(block))
+            with open(idx_path + ".tmp", "w") as idx:
+                idx.writelines(f"{ts:.3f}\t{offset}\t{comp}\n" for ts, offset, comp in compressed)
+            with self._swap_lock:
+                os.replace(gz_path + ".tmp", gz_path)
+                os.replace(idx_path + ".tmp", idx_path)
+                os.remove(log_path)
+        except OSError as e:
+            self.logger.error(f"Error compressing {log_path}: {e}")
+
+    def _prune(self, bot_folder):
+        segments = self.list_segments(bot_folder)
+        for started, path in segments[:max(0, len(segments) - self.max_segments)]:
+            log_path = path[:-3] if path.endswith(".gz") else path
+            for p in (log_path, log_path + ".gz", self._index_path(path)):
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _index_path(segment_path):
+        name = os.path.basename(segment_path).split(".")[0]
+        return os.path.join(os.path.dirname(segment_path), name + ".idx")
+
+    @staticmethod
+    def _read_index(idx_path):
+        rows = []
+        try:
+            with open(idx_path) as idx:
+                for row in idx:
+                    parts = row.split()
+                    if len(parts) >= 2:
+                        rows.append((float(parts[0]), int(parts[1]), int(parts[2]) if len(parts) > 2 else None))
+        except OSError:
+            pass
+        return rows
+
+    def list_segments(self, bot_folder):
+        """[(start ts, path)] of compressed segments, oldest first"""
+        try:
+            names = os.listdir(self.bot_dir(bot_folder))
+        except OSError:
+            return []
+        segments = {}
+        for name in names:
+            if name.endswith(".log.gz") or name.endswith(".log"):
+                stamp = int(name.split(".")[0])
+                # Both exist until a compression finishes; the .gz is the complete one
+                if stamp not in segments or name.endswith(".gz"):
+                    segments[stamp] = os.path.join(self.bot_dir(bot_folder), name)
+        # Names are milliseconds; ten digits or fewer is an older archive named in seconds
+        return sorted((stamp / 1000 if stamp >= 10 ** 11 else stamp, path) for stamp, path in segments.items())
+
+    def _open_segment(self, path):
+        """(file, index rows) of a segment, taken together so a concurrent
+        compression can't pair the raw file with the compressed index"""
+        with self._swap_lock:
+            if path.endswith(".log") and not os.path.exists(path):
+                path += ".gz"  # compressed since it was listed
+            return open(path, "rb"), self._read_index(self._index_path(path))
+
+    def read_range(self, bot_folder, start, end):
+        """Yield (ts, line) archived between start and end, oldest first"""
+        self.flush()
+        segments = self.list_segments(bot_folder)
+        for i, (started, path) in enumerate(segments):
+            next_started = segments[i + 1][0] if i + 1 < len(segments) else float("inf")
+            if started > end or next_started < start:
+                continue
+            try:
+                f, rows = self._open_segment(path)
+            except OSError:
+                continue  # pruned since it was listed
+            compressed = f.name.endswith(".gz")
+            times = [row[0] for row in rows]
+            first = max(0, bisect.bisect_right(times, start) - 1)
+            try:
+                with f:
+                    for j in range(first, len(rows)):
+                        ts, offset, comp = rows[j]
+                        if ts > end:
+                            break
+                        if compressed and comp is None:
+                            # Interrupted compression left the raw index next to the .gz
+                            self.logger.error(f"Archive segment {f.name} has no compressed index")
+                            break
+                        if compressed:
+                            f.seek(comp)
+                            stop = rows[j + 1][2] if j + 1 < len(rows) else None
+                            raw = f.read(stop - comp) if stop is not None else f.read()
+                            block = gzip.decompress(raw)
+                        else:
+                            f.seek(offset)
+                            stop = rows[j + 1][1] if j + 1 < len(rows) else None
+                            block = f.read(stop - offset) if stop is not None else f.read()
+                        for raw_line in block.decode("utf-8", errors="replace").splitlines():
+                            stamp, _, line = raw_line.partition(" ")
+                            try:
+                                line_ts = float(stamp)
+                            except ValueError:
+                                continue
+                            if start <= line_ts <= end:
+                                yield line_ts, line
+            except (OSError, EOFError) as e:
+                self.logger.error(f"Error reading archive segment {f.name}: {e}")
+
+class SearchJob:
+    """Results of one fleet-wide log search, filled in while it runs"""
+    def __init__(self, search_id, pattern, regex, ignore_case, since, max_results):
+        self.id = search_id
+        self.pattern = pattern
+        self.regex = regex
+        self.ignore_case = ignore_case
+        self.since = since
+        self.max_results = max_results
+        self.results = []  # {'bot', 'line', 'offset', 'text', 'indexed_at'}
+        self.files_total = 0
+        self.files_done = 0
+        self.done = False
+        self.truncated = False
+        self.error = None
+        self.cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def add(self, result):
+        with self._lock:
+            if len(self.results) >= self.max_results:
+                self.truncated = True
+                return False
+            self.results.append(result)
+            return True
+
+    def file_done(self):
+        """Called from the pool threads, one per file searched"""
+        with self._lock:
+            self.files_done += 1
+
+    def page(self, offset=0, limit=100):
+        return {
+            'id': self.id,
+            'done': self.done,
+            'truncated': self.truncated,
+            'error': self.error,
+            'files': [self.files_done, self.files_total],
+            'total': len(self.results),
+            'offset': offset,
+            'results': self.results[offset:offset + limit]
+        }
+
+class LogSearch:
+    """Regex/substring search over many console.txt files at once.
+
+    Files are scanned through mmap (no copies of the file into Python), in
+    parallel. A persistent per-file index of (line start offset, line number,
+    first seen time) checkpoints, one per 64 KiB, is extended incrementally as
+    files grow; it turns match offsets into line numbers and lets a "since"
+    search skip everything indexed before that time.
+    """
+    BLOCK = 64 * 1024
+
+    def __init__(self, logger, index_path, max_workers=4):
+        self.logger = logger
+        self.index_path = index_path
+        self.max_workers = max_workers
+        self.index = {}  # path -> {'ident', 'size', 'lines', 'checkpoints': [[offset, line, ts]]}
+        self.searches = {}  # id -> SearchJob
+        self._search_ids = itertools.count(1)
+        self._path_locks = defaultdict(threading.Lock)
+        self._save_lock = threading.Lock()
+        self._index_lock = threading.Lock()  # publishing entries vs serializing self.index
+        try:
+            with open(index_path) as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def save_index(self):
+        with self._save_lock:
+            try:
+                # Published entries are never changed again, so this copy is consistent
+                with self._index_lock:
+                    data = json.dumps(self.index)
+                tmp_path = self.index_path + ".tmp"
+                with open(tmp_path, "w") as f:
+                    f.write(data)
+                os.replace(tmp_path, self.index_path)
+            except OSError as e:
+                self.logger.error(f"Error saving search index: {e}")
+
+    def _update_index(self, path, mm, st):
+        """Extend the index of path up to the current size; reset it on truncate/rotate.
+
+        Works on a copy and publishes it whole, so save_index never sees an
+        entry half way through an update.
+        """
+        ident = [st.st_dev, st.st_ino]
+        entry = self.index.get(path)
+        if entry is None or entry['ident'] != ident or st.st_size < entry['size']:
+            entry = {'ident': ident, 'size': 0, 'lines': 0, 'checkpoints': [[0, 0, time.time()]]}
+        else:
+            entry = dict(entry, checkpoints=list(entry['checkpoints']))
+        pos, lines, now = entry['size'], entry['lines'], time.time()
+        size = st.st_size
+        if 0 < pos < size:
+            # Growth mark: everything from here on was first seen now
+            entry['checkpoints'].append([mm.rfind(b"\n", 0, pos) + 1, lines, now])
+        while pos < size:
+            end = min(size, (pos // self.BLOCK + 1) * self.BLOCK)
+            lines += mm[pos:end].count(b"\n")
+            pos = end
+            if pos < size and pos % self.BLOCK == 0:
+                # Checkpoint the line that contains the block boundary
+                line_start = mm.rfind(b"\n", 0, pos) + 1
+                entry['checkpoints'].append([line_start, lines, now])
+        entry['size'], entry['lines'] = size, lines
+        with self._index_lock:
+            self.index[path] = entry
+        return entry
+
+    def search(self, files, pattern, regex=False, ignore_case=True, since=None, max_results=5000):
+        """Start a search over {bot: path} in the background and return its SearchJob"""
+        job = SearchJob(str(next(self._search_ids)), pattern, regex, ignore_case, since, max_results)
+        flags = re.IGNORECASE if ignore_case else 0
+        source = pattern if regex else re.escape(pattern)
+        matcher = re.compile(source.encode("utf-8"), flags)
+        job.files_total = len(files)
+        self.searches[job.id] = job
+        # Keep only the most recent searches around
+        for old_id in list(self.searches)[:-20]:
+            self.searches.pop(old_id, None)
+        threading.Thread(target=self._run, args=(job, files, matcher), name=f"search-{job.id}", daemon=True).start()
+        return job
+
+    def _run(self, job, files, matcher):
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="search") as pool:
+                for bot_folder, path in files.items():
+                    pool.submit(self._search_file, job, bot_folder, path, matcher)
+        except Exception as e:
+            job.error = str(e)
+            self.logger.error(f"Search {job.id} failed: {e}")
+        job.done = True
+        self.save_index()
+
+    def _search_file(self, job, bot_folder, path, matcher):
+        try:
+            if job.cancel_event.is_set():
+                return
+            with open(path, "rb") as f:
+                st = os.fstat(f.fileno())
+                if st.st_size == 0:
+                    return
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    with self._path_locks[path]:
+                        entry = self._update_index(path, mm, st)
+                    self._scan(job, bot_folder, mm, entry, matcher)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            self.logger.error(f"Error searching {path}: {e}")
+        finally:
+            job.file_done()
+
+    def _scan(self, job, bot_folder, mm, entry, matcher):
+        checkpoints = entry['checkpoints']
+        offsets = [cp[0] for cp in checkpoints]
+        pos = 0
+        if job.since is not None:
+            times = [cp[2] for cp in checkpoints]
+            first = bisect.bisect_left(times, job.since)
+            if first >= len(checkpoints):
+                return
+            pos = checkpoints[first][0]
+        size = len(mm)
+        counted_offset, counted_line = None, None
+        while pos < size and not job.cancel_event.is_set():
+            match = matcher.search(mm, pos)
+            if match is None:
+                break
+            start = mm.rfind(b"\n", 0, match.start()) + 1
+            end = mm.find(b"\n", match.start())
+            if end < 0:
+                end = size
+            # Line number: nearest checkpoint (or the previous hit) plus newlines since
+            cp = checkpoints[bisect.bisect_right(offsets, start) - 1]
+            if counted_offset is None or counted_offset < cp[0]:
+                counted_offset, counted_line = cp[0], cp[1]
+            counted_line += mm[counted_offset:start].count(b"\n")
+            counted_offset = start
+            text = mm[start:end].decode("utf-8", errors="replace").rstrip("\r")
+            if not job.add({'bot': bot_folder, 'line': counted_line + 1, 'offset': start,
+                            'text': text, 'indexed_at': cp[2]}):
+                return
+            pos = end + 1
+
+class HitCounter:
+    """Total hit count plus a one-minute rate kept in per-second buckets"""
+    WINDOW = 60
 
-class BotManager:
     def __init__(self):
+        self.total = 0
+        self._counts = [0] * self.WINDOW
+        self._seconds = [0] * self.WINDOW  # epoch second each bucket belongs to
+
+    def add(self, count=1, now=None):
+        second = int(time.time() if now is None else now)
+        slot = second % self.WINDOW
+        if self._seconds[slot] != second:
+            self._seconds[slot] = second
+            self._counts[slot] = 0
+        self._counts[slot] += count
+        self.total += count
+
+    def per_minute(self, now=None):
+        second = int(time.time() if now is None else now)
+        return sum(count for count, at in zip(self._counts, self._seconds)
+                   if second - self.WINDOW < at <= second)
+
+def split_patterns(text):
+    """Split a ';'-separated pattern list as typed in the UI"""
+    return [part.strip() for part in (text or "").split(";") if part.strip()]
+
+class FilterSet:
+    """Include/exclude regex sets compiled once into single alternations.
+
+    Every include pattern becomes a named group of one combined regex, so a
+    single finditer() pass decides whether a line is shown, which pattern
+    matched and where to highlight it. Exclude patterns are folded into a
+    second regex that is checked first. Patterns with capturing groups of
+    their own are kept as separate regexes, since the alternation would
+    renumber their groups and break backreferences or clash on names.
+    Hits are counted per (bot, pattern).
+    """
+    def __init__(self, include=(), exclude=(), ignore_case=True):
+        self.include = [pattern for pattern in include if pattern]
+        self.exclude = [pattern for pattern in exclude if pattern]
+        self.ignore_case = ignore_case
+        flags = re.IGNORECASE if ignore_case else 0
+        # Raises re.error for an invalid pattern, before anything is followed
+        compiled = {pattern: re.compile(pattern, flags) for pattern in self.include + self.exclude}
+        self._groups = {f"f{i}": pattern for i, pattern in enumerate(self.include) if not compiled[pattern].groups}
+        self._separate = [(pattern, compiled[pattern]) for pattern in self.include if compiled[pattern].groups]
+        self._include_re = None
+        if self._groups:
+            self._include_re = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in self._groups.items()), flags)
+        self._exclude_res = [compiled[pattern] for pattern in self.exclude if compiled[pattern].groups]
+        plain = [pattern for pattern in self.exclude if not compiled[pattern].groups]
+        if plain:
+            self._exclude_res.insert(0, re.compile("|".join(f"(?:{pattern})" for pattern in plain), flags))
+        self.hits = {}  # (bot, pattern) -> HitCounter
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, spec):
+        spec = spec or {}
+        return cls(spec.get("include", ()), spec.get("exclude", ()), spec.get("ignore_case", True))
+
+    def to_config(self):
+        return {"include": list(self.include), "exclude": list(self.exclude), "ignore_case": self.ignore_case}
+
+    def apply(self, bot, lines):
+        """Return (line, spans) for each line that passes; spans are the include match ranges"""
+        include_re = self._include_re
+        separate = self._separate
+        exclude_res = self._exclude_res
+        groups = self._groups
+        shown = []
+        counts = defaultdict(int)
+        for line in lines:
+            if exclude_res and any(regex.search(line) for regex in exclude_res):
+                continue
+            if include_re is None and not separate:
+                shown.append((line, ()))
+                continue
+            spans = []
+            if include_re is not None:
+                for match in include_re.finditer(line):
+                    counts[groups[match.lastgroup]] += 1
+                    if match.end() > match.start():
+                        spans.append(match.span())
+            for pattern, regex in separate:
+                for match in regex.finditer(line):
+                    counts[pattern] += 1
+                    if match.end() > match.start():
+                        spans.append(match.span())
+            if spans:
+                if separate:
+                    spans.sort()
+                shown.append((line, spans))
+        if counts:
+            now = time.time()
+            with self._lock:
+                for pattern, count in counts.items():
+                    key = (bot, pattern)
+                    counter = self.hits.get(key)
+                    if counter is None:
+                        counter = self.hits[key] = HitCounter()
+                    counter.add(count, now)
+        return shown
+
+    def hit_stats(self, bot, now=None):
+        """(pattern, total, hits in the last minute) for every include pattern"""
+        now = time.time() if now is None else now
+        stats = []
+        for pattern in self.include:
+            counter = self.hits.get((bot, pattern))
+            if counter is None:
+                stats.append((pattern, 0, 0))
+            else:
+                stats.append((pattern, counter.total, counter.per_minute(now)))
+        return stats
+
+class TextPump:
+    """Moves lines from worker threads into Text widgets on the Tk thread.
+
+    Workers only append to a per-widget deque; one after() loop drains each
+    deque with a single insert and a single scroll per frame and trims the
+    widget to its line limit in one delete. A queued entry is either a line
+    or a (line, spans) pair whose spans get HIGHLIGHT_TAG.
+    """
+    HIGHLIGHT_TAG = "hit"
+
+    def __init__(self, root, interval_ms=100, stats=None):
+        self.root = root
+        self.stats = stats  # HotPathStats for the per-frame redraw time
+        self.interval_ms = interval_ms
+        self._pending = {}  # widget -> deque of lines not yet shown
+        self._limits = {}  # widget -> max lines kept in the widget
+
+    def register(self, widget, max_lines):
+        self._limits[widget] = max_lines
+        # Anything older than max_lines would be trimmed right away anyway
+        self._pending[widget] = deque(maxlen=max_lines)
+
+    def unregister(self, widget):
+        self._pending.pop(widget, None)
+        self._limits.pop(widget, None)
+
+    def push(self, widget, lines):
+        """Thread-safe: queue lines for widget; dropped if it isn't registered"""
+        pending = self._pending.get(widget)
+        if pending is not None:
+            pending.extend(lines)
+
+    def clear(self, widget):
+        pending = self._pending.get(widget)
+        if pending is not None:
+            pending.clear()
+
+    def start(self):
+        self.root.after(self.interval_ms, self._tick)
+
+    def _tick(self):
+        began = time.perf_counter()
+        busy = False
+        for widget, pending in list(self._pending.items()):
+            try:
+                # Checked even when idle: a closed window's queue may never fill again
+                if not widget.winfo_exists():
+                    self.unregister(widget)
+                    continue
+            except Exception:
+                self.unregister(widget)
+                continue
+            if not pending:
+                continue
+            busy = True
+            try:
+                batch = []
+                marks = []  # (offset in batch, spans)
+                while pending:
+                    entry = pending.popleft()
+                    if isinstance(entry, tuple):
+                        entry, spans = entry
+                        if spans:
+                            marks.append((len(batch), spans))
+                    batch.append(entry)
+                first_row = int(widget.index("end-1c").split(".")[0])
+                widget.insert("end", "\n".join(batch) + "\n")
+                for offset, spans in marks:
+                    row = first_row + offset
+                    for start, end in spans:
+                        widget.tag_add(self.HIGHLIGHT_TAG, f"{row}.{start}", f"{row}.{end}")
+                line_count = int(widget.index("end-1c").split(".")[0]) - 1
+                excess = line_count - self._limits[widget]
+                if excess > 0:
+                    widget.delete("1.0", f"{excess + 1}.0")
+                widget.see("end")
+            except Exception:
+                self.unregister(widget)
+        if busy and self.stats is not None:
+            self.stats.observe('ui_pump', time.perf_counter() - began)
+        try:
+            if self.root.winfo_exists():
+                self.root.after(self.interval_ms, self._tick)
+        except Exception:
+            pass
+
+class BotFolderScanner:
+    """Finds bot folders (folders holding start.exe) under a base directory.
+
+    Uses os.scandir, so the file type (and on Windows the mtime) comes with
+    the listing itself. A folder is only looked into again when its own mtime
+    changes, which makes rescanning thousands of unchanged folders cheap.
+    """
+    def __init__(self):
+        self.base_dir = None
+        self._folders = {}  # folder -> (st_mtime_ns, is_bot) from the last scan
+        self._lock = threading.Lock()
+
+    def scan(self, base_dir):
+        """Return the bot folders under base_dir, sorted by name"""
+        with self._lock:
+            cache = self._folders if base_dir == self.base_dir else {}
+        folders = {}
+        with os.scandir(base_dir) as entries:
+            for entry in entries:
+                try:
+                    if not entry.is_dir():
+                        continue
+                    mtime = entry.stat().st_mtime_ns
+                except OSError:
+                    continue
+                cached = cache.get(entry.name)
+                if cached is not None and cached[0] == mtime:
+                    folders[entry.name] = cached
+                else:
+                    folders[entry.name] = (mtime, self._is_bot_folder(entry.path, entry.name))
+        with self._lock:
+            self.base_dir = base_dir
+            self._folders = folders
+        return sorted(name for name, (_, is_bot) in folders.items() if is_bot)
+
+    def _is_bot_folder(self, path, name):
+        # A running bot's start.exe is renamed to start_<folder>.exe for a while
+        return (os.path.exists(os.path.join(path, "start.exe"))
+                or os.path.exists(os.path.join(path, f"start_{name}.exe")))
+
+    def folder_exists(self, base_dir, name):
+        """Answer from the last scan when possible instead of touching the disk"""
+        with self._lock:
+            if base_dir == self.base_dir and name in self._folders:
+                return True
+        return os.path.isdir(os.path.join(base_dir, name))
+
+class Job:
+    """A start/stop/restart operation over one or more bots, run in the background"""
+    def __init__(self, job_id, op, bots, options=None):
+        self.id = job_id
+        self.op = op
+        self.bots = list(dict.fromkeys(bots))  # a bot named twice is acted on once
+        self.options = options or {}  # extra keyword arguments for the action
+        self.state = 'pending'  # pending -> running -> done | cancelled | failed
+        self.results = {}  # bot -> True/False, filled in as each bot finishes
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def progress(self):
+        done = len(self.results)
+        ok = sum(1 for result in list(self.results.values()) if result)
+        return done, ok, len(self.bots)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'op': self.op,
+            'bots': self.bots,
+            'state': self.state,
+            'progress': len(self.results),
+            'results': dict(self.results),
+            'error': self.error,
+            'created': self.created,
+            'finished': self.finished
+        }
+
+class BulkOrchestrator:
+    """Runs a job's per-bot actions on a bounded pool with a launch rate limit"""
+    def __init__(self, manager, max_in_flight=4, launches_per_second=2.0):
+        self.manager = manager
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.launches_per_second = launches_per_second
+        self.pool = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="bulk")
+        self._rate_lock = threading.Lock()
+        self._next_launch = 0.0
+
+    def _wait_for_launch_slot(self, job):
+        """Space launches 1/rate apart; False if the job got cancelled while waiting"""
+        if self.launches_per_second <= 0:
+            return not job.cancel_event.is_set()
+        with self._rate_lock:
+            now = time.monotonic()
+            slot = max(now, self._next_launch)
+            self._next_launch = slot + 1.0 / self.launches_per_second
+        return not job.cancel_event.wait(slot - now)
+
+    def _run_one(self, job, action, bot_folder, rate_limited):
+        if job.cancel_event.is_set():
+            return
+        if rate_limited and not self._wait_for_launch_slot(job):
+            return
+        try:
+            result = bool(action(bot_folder, **job.options))
+        except Exception as e:
+            self.manager.logger.error(f"Job {job.id}: {job.op} {bot_folder} failed: {e}")
+            result = False
+        job.results[bot_folder] = result
+
+    def run(self, job, action):
+        """Block until every bot of the job is processed or skipped by cancel"""
+        rate_limited = job.op in ('start', 'restart')
+        futures = [self.pool.submit(self._run_one, job, action, bot_folder, rate_limited)
+                   for bot_folder in job.bots]
+        wait_futures(futures)
+
+    def run_now(self, job, action):
+        """Process the job's bots on the calling thread, skipping the pool and the rate limit"""
+        for bot_folder in job.bots:
+            self._run_one(job, action, bot_folder, False)
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+class ExitWatcher:
+    """One thread that learns about bot exits the moment they happen.
+
+    Linux waits on a pidfd per process in a selector, Windows on the process
+    handles with WaitForMultipleObjects; other platforms fall back to polling.
+    callback(process, returncode) runs on the watcher thread, once per process.
+    """
+    WAIT_BATCH = 64  # MAXIMUM_WAIT_OBJECTS
+    WAIT_FAILED = 0xFFFFFFFF
+
+    def __init__(self, logger, poll_interval=0.5):
+        self.logger = logger
+        self.poll_interval = poll_interval
+        self._watched = {}  # process -> callback
+        self._lock = threading.Lock()
+        self._thread = None
+        self._windows = os.name == "nt"
+        self._pidfd = hasattr(os, "pidfd_open")
+        if self._pidfd:
+            self._selector = selectors.DefaultSelector()
+            self._wake_r, self._wake_w = os.pipe()
+            os.set_blocking(self._wake_r, False)
+            self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+
+    def watch(self, process, callback):
+        with self._lock:
+            self._watched[process] = callback
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="exit-watcher", daemon=True)
+            self._thread.start()
+        self._wake()
+
+    def unwatch(self, process):
+        with self._lock:
+            self._watched.pop(process, None)
+        self._wake()
+
+    def _wake(self):
+        if self._pidfd:
+            os.write(self._wake_w, b"x")
+
+    def _run(self):
+        fds = {}  # process -> pidfd
+        while True:
+            with self._lock:
+                watched = dict(self._watched)
+            try:
+                if self._pidfd:
+                    self._wait_pidfds(watched, fds)
+                elif self._windows:
+                    self._wait_handles(watched)
+                else:
+                    time.sleep(self.poll_interval)
+            except Exception as e:
+                self.logger.error(f"Error waiting for bot exits: {e}")
+                time.sleep(self.poll_interval)
+            for process, callback in watched.items():
+                exited, returncode = poll_exit(process)
+                if not exited:
+                    continue
+                with self._lock:
+                    if self._watched.get(process) is not callback:
+                        continue  # unwatched meanwhile: a deliberate stop
+                    del self._watched[process]
+                try:
+                    callback(process, returncode)
+                except Exception as e:
+                    self.logger.error(f"Error handling exit of PID {process.pid}: {e}")
+
+    def _wait_pidfds(self, watched, fds):
+        for process in list(fds):
+            if process not in watched:
+                self._selector.unregister(fds[process])
+                os.close(fds.pop(process))
+        for process in watched:
+            if process not in fds:
+                try:
+                    fds[process] = os.pidfd_open(process.pid)
+                except OSError:
+                    continue  # already reaped; poll() below reports it
+                self._selector.register(fds[process], selectors.EVENT_READ, process)
+        # The timeout is only a safety net: exits and new watches both wake the selector
+        for key, _ in self._selector.select(timeout=5.0):
+            if key.data is None:
+                try:
+                    while os.read(self._wake_r, 4096):
+                        pass
+                except BlockingIOError:
+                    pass
+
+    def _wait_handles(self, watched):
+        # Adopted bots have no handle of ours; the poll after each wait covers them
+        handles = [int(process._handle) for process in watched if hasattr(process, "_handle")]
+        if not handles:
+            time.sleep(self.poll_interval)
+            return
+        kernel32 = ctypes.windll.kernel32
+        kernel32.WaitForMultipleObjects.restype = ctypes.c_uint32
+        batches = [handles[i:i + self.WAIT_BATCH] for i in range(0, len(handles), self.WAIT_BATCH)]
+        timeout_ms = int(self.poll_interval * 1000) // len(batches)
+        for batch in batches:
+            array_type = ctypes.c_void_p * len(batch)
+            result = kernel32.WaitForMultipleObjects(len(batch), array_type(*batch), False, timeout_ms)
+            if result == self.WAIT_FAILED:
+                # Usually a handle closed under us; back off, _run rebuilds the list
+                self.logger.error(f"WaitForMultipleObjects failed: error {kernel32.GetLastError()}")
+                time.sleep(self.poll_interval)
+                return
+            if result < len(batch):
+                return  # WAIT_OBJECT_0 + i: something exited
+
+class AdoptedProcess:
+    """Popen-like stand-in for a bot process this manager did not launch.
+
+    Only the parent can collect an exit code, so returncode stays None even
+    once such a process is gone; exited tells the two apart (see poll_exit).
+    """
+    def __init__(self, handle):
+        self.handle = handle
+        self.pid = handle.pid
+        self.returncode = None
+        self.exited = False
+
+    def poll(self):
+        if not self.exited:
+            try:
+                running = self.handle.is_running() and self.handle.status() != psutil.STATUS_ZOMBIE
+            except psutil.Error:
+                running = False
+            self.exited = not running
+        return self.returncode
+
+    def wait(self, timeout=None):
+        try:
+            self.handle.wait(timeout)
+        except psutil.TimeoutExpired:
+            raise subprocess.TimeoutExpired(str(self.pid), timeout)
+        except psutil.Error:
+            pass
+        return self.poll()
+
+def poll_exit(process):
+    """(exited, returncode) of a Popen or AdoptedProcess; an adopted bot's code is None"""
+    returncode = process.poll()
+    return returncode is not None or (isinstance(process, AdoptedProcess) and process.exited), returncode
+
+class StateJournal:
+    """Append-only JSON-lines record of the bots this manager runs.
+
+    Lines are start (pid, create_time, exe, cwd, started, mode), restart
+    (next restart due) and stop entries; replaying them gives the live state
+    per bot. Once compact_after lines pile up the file is rewritten with just
+    that state.
+    """
+    def __init__(self, logger, path, compact_after=1000):
+        self.logger = logger
+        self.path = path
+        self.compact_after = compact_after
+        self._lines = None  # lines in the file, counted on first use
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Replay the journal into {bot: record}; unreadable lines are skipped"""
+        with self._lock:
+            return self._replay()
+
+    def _replay(self):
+        # Caller holds self._lock, so no append lands between reading and rewriting
+        state = {}
+        lines = 0
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                        bot_folder = entry["bot"]
+                        op = entry["op"]
+                    except (ValueError, KeyError, TypeError):
+                        continue  # e.g. a line cut short by a crash
+                    if op == "start":
+                        state[bot_folder] = {key: value for key, value in entry.items() if key != "op"}
+                    elif op == "stop":
+                        state.pop(bot_folder, None)
+                    elif op == "restart" and bot_folder in state:
+                        state[bot_folder]["restart_due"] = entry.get("due")
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.logger.error(f"Error reading state journal: {e}")
+        self._lines = lines
+        return state
+
+    def record_start(self, bot_folder, pid, create_time, exe, cwd, started, mode):
+        self._append({"op": "start", "bot": bot_folder, "pid": pid, "create_time": create_time,
+                      "exe": exe, "cwd": cwd, "started": started, "mode": mode})
+
+    def record_restart(self, bot_folder, due):
+        self._append({"op": "restart", "bot": bot_folder, "due": due})
+
+    def record_stop(self, bot_folder):
+        self._append({"op": "stop", "bot": bot_folder})
+
+    def _append(self, entry):
+        with self._lock:
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+            except OSError as e:
+                self.logger.error(f"Error writing state journal: {e}")
+                return
+            if self._lines is not None:
+                self._lines += 1
+                if self._lines < self.compact_after:
+                    return
+        self.compact()
+
+    def compact(self):
+        """Rewrite the journal as one start (and restart) line per live bot"""
+        with self._lock:
+            state = self._replay()
+            temp_path = self.path + ".tmp"
+            try:
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    for bot_folder, record in state.items():
+                        entry = {"op": "start", "bot": bot_folder}
+                        entry.update({key: value for key, value in record.items() if key not in ("bot", "restart_due")})
+                        f.write(json.dumps(entry) + "\n")
+                        if record.get("restart_due") is not None:
+                            f.write(json.dumps({"op": "restart", "bot": bot_folder, "due": record["restart_due"]}) + "\n")
+                os.replace(temp_path, self.path)
+                self._lines = sum(2 if record.get("restart_due") is not None else 1 for record in state.values())
+            except OSError as e:
+                self.logger.error(f"Error compacting state journal: {e}")
+        return state
+
+class Histogram:
+    """Cumulative-bucket histogram rendered in the Prometheus text format"""
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def render(self, name, help_text):
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+        lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        cumulative = 0
+        for bound, count in zip(self.buckets + (None,), counts):
+            cumulative += count
+            le = "+Inf" if bound is None else f"{bound:g}"
+            lines.append(f'{name}_bucket{{le="{le}"}} {cumulative}')
+        lines.append(f"{name}_sum {total:.6f}")
+        lines.append(f"{name}_count {cumulative}")
+        return lines
+
+class HotPathStats:
+    """Cheap timers and counters for the manager's hot paths.
+
+    Recording is a lock and three updates; each path keeps its call count,
+    total time and a ring of its latest durations, and percentiles are only
+    computed when someone asks for them.
+    """
+    def __init__(self, keep=1024):
+        self.keep = keep
+        self.paths = {}  # name -> [count, total seconds, deque of recent durations]
+        self.counters = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds):
+        with self._lock:
+            path = self.paths.get(name)
+            if path is None:
+                path = self.paths[name] = [0, 0.0, deque(maxlen=self.keep)]
+            path[0] += 1
+            path[1] += seconds
+            path[2].append(seconds)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def reset(self):
+        with self._lock:
+            self.paths.clear()
+            self.counters.clear()
+
+    def summary(self):
+        """{path: {count, total_s, p50_ms, p99_ms, max_ms}} over the recent durations"""
+        with self._lock:
+            paths = {name: (count, total, sorted(recent)) for name, (count, total, recent) in self.paths.items()}
+        result = {}
+        for name, (count, total, recent) in sorted(paths.items()):
+            result[name] = {
+                'count': count,
+                'total_s': round(total, 3),
+                'p50_ms': round(recent[len(recent) // 2] * 1000, 3),
+                'p99_ms': round(recent[min(len(recent) - 1, int(len(recent) * 0.99))] * 1000, 3),
+                'max_ms': round(recent[-1] * 1000, 3)
+            }
+        return result
+
+def hot_path(name):
+    """Time a BotManager method into the manager's HotPathStats under name"""
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            began = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self.hot_paths.observe(name, time.perf_counter() - began)
+        return wrapper
+    return decorate
+
+class Diagnostics:
+    """Where the manager's own time goes: CPU per subsystem, stack samples, allocations.
+
+    Subsystems are thread names without their pool suffix ("metrics-shard_3"
+    counts as "metrics-shard"), so their CPU comes from per-thread times
+    rather than from tracing; nothing here costs anything until it's called.
+    """
+    def __init__(self, logger, directory):
+        self.logger = logger
+        self.directory = directory
+        self.process = psutil.Process()
+        self.profiling = False
+        self.tracing = False  # tracemalloc started by dump_tracemalloc, stopped by the next dump
+        self._baselines = {}  # caller -> (monotonic time, {thread id: cpu seconds}, process cpu seconds)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def subsystem(name):
+        if name == "MainThread":
+            return "main"
+        name = re.sub(r"[_-]\d+$", "", name.split(" (")[0])
+        return "other" if name == "Thread" else name
+
+    def usage(self, caller):
+        """(process cpu percent, [(subsystem, threads, cpu percent)] busiest first), both
+        since caller's previous call.
+
+        Each caller ("ui", "api") keeps its own baseline, so the Diagnostics tab
+        and GET /diagnostics don't shorten each other's intervals.
+        """
+        names = {thread.native_id: thread.name for thread in threading.enumerate()}
+        with self.process.oneshot():
+            times = {thread.id: thread.user_time + thread.system_time for thread in self.process.threads()}
+            cpu_times = self.process.cpu_times()
+        now = time.monotonic()
+        total = cpu_times.user + cpu_times.system
+        with self._lock:
+            last_at, last, last_total = self._baselines.get(caller) or (None, {}, total)
+            self._baselines[caller] = (now, times, total)
+        usage = {}
+        for tid, cpu in times.items():
+            group = self.subsystem(names.get(tid, "other"))
+            threads, delta = usage.get(group, (0, 0.0))
+            usage[group] = (threads + 1, delta + max(0.0, cpu - last.get(tid, cpu)))
+        elapsed = now - last_at if last_at is not None else 0
+        rows = [(group, threads, round(100.0 * delta / elapsed, 1) if elapsed > 0 else 0.0)
+                for group, (threads, delta) in usage.items()]
+        cpu = round(100.0 * max(0.0, total - last_total) / elapsed, 1) if elapsed > 0 else 0.0
+        return cpu, sorted(rows, key=lambda row: (-row[2], row[0]))
+
+    def _path(self, prefix, extension):
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}")
+
+    def profile(self, seconds=10, interval=0.005, on_done=None):
+        """Sample every thread's stack in the background; on_done(path, top functions) after.
+
+        The file has one collapsed stack per line ("thread;outer;...;inner
+        count"), the input flamegraph.pl and speedscope read.
+        """
+        if self.profiling:
+            return False
+        self.profiling = True
+
+        def run():
+            me = threading.get_ident()
+            stacks = defaultdict(int)
+            leaves = defaultdict(int)
+            deadline = time.monotonic() + seconds
+            try:
+                while time.monotonic() < deadline:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                    for ident, frame in sys._current_frames().items():
+                        if ident == me:
+                            continue
+                        frames = []
+                        while frame is not None:
+                            code = frame.f_code
+                            frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                            frame = frame.f_back
+                        if not frames:
+                            continue
+                        leaves[frames[0]] += 1
+                        frames.append(names.get(ident, str(ident)))
+                        stacks[";".join(reversed(frames))] += 1
+                    time.sleep(interval)
+                path = self._path("profile", "folded")
+                with open(path, "w", encoding="utf-8") as f:
+                    for stack, count in sorted(stacks.items(), key=lambda item: -item[1]):
+                        f.write(f"{stack} {count}\n")
+                top = sorted(leaves.items(), key=lambda item: -item[1])[:10]
+                self.logger.info(f"Profile of {seconds}s written to {path}")
+            except Exception as e:
+                self.logger.error(f"Error profiling the manager: {e}")
+                path, top = None, []
+            finally:
+                self.profiling = False
+            if on_done is not None:
+                on_done(path, top)
+
+        threading.Thread(target=run, name="profiler", daemon=True).start()
+        return True
+
+    def dump_tracemalloc(self, frames=1):
+        """Start tracing on first use (returns None); the next call writes a snapshot,
+        stops the tracing it started and returns the snapshot's path.
+
+        Writes the raw snapshot (tracemalloc.Snapshot.load reads it back) and
+        a .txt with the 50 lines holding the most memory. Tracing slows every
+        allocation, more so with more frames, so it only runs between two dumps.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            self.tracing = True
+            self.logger.info("tracemalloc started; dump again to write a snapshot")
+            return None
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if self.tracing:
+            tracemalloc.stop()
+            self.tracing = False
+        path = self._path("tracemalloc", "dump")
+        snapshot.dump(path)
+        with open(path[:-len(".dump")] + ".txt", "w", encoding="utf-8") as f:
+            f.write(f"traced: {current / 1048576:.1f} MB now, {peak / 1048576:.1f} MB peak\n")
+            for stat in snapshot.statistics("lineno")[:50]:
+                f.write(f"{stat}\n")
+        self.logger.info(f"tracemalloc snapshot written to {path}")
+        return path
+
+def prometheus_label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+class ControlRequestHandler(BaseHTTPRequestHandler):
+    """Routes for the loopback control API.
+
+    GET  /status (ETag: snapshot version; bots carry "started", not a live uptime),
+         /status/<bot>, /metrics, /diagnostics, /events?bot=&type=&since=<ts>, /jobs, /jobs/<id>,
+         /archive/<bot>?from=<ts>&to=<ts>, /history/<bot>?from=<ts>&to=<ts>,
+         /search?q=<text>&regex=0|1&case=0|1&since=<ts>, /search/<id>?offset=&limit=
+    POST /bots/<bot>/<start|stop|restart>, /bulk/<start|stop|restart> {"bots": [...]},
+         /jobs/<id>/cancel
+    """
+    server_version = "KoreManager"
+
+    def log_message(self, format, *args):
+        self.server.api.manager.logger.debug(f"API {self.address_string()} {format % args}")
+
+    def _send_json(self, code, payload):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _page_arg(self, query, name, default):
+        """Non-negative integer query argument; sends a 400 and returns None when malformed"""
+        try:
+            value = int(query.get(name, [default])[0])
+            if value < 0:
+                raise ValueError
+        except ValueError:
+            self._send_json(400, {'error': f"{name} must be a non-negative integer"})
+            return None
+        return value
+
+    def _authorized(self):
+        token = self.server.api.token
+        if token and self.headers.get("Authorization") != f"Bearer {token}":
+            self._send_json(401, {'error': 'unauthorized'})
+            return False
+        return True
+
+    def _path_parts(self):
+        return [part for part in urlparse(self.path).path.split('/') if part]
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        manager = self.server.api.manager
+        parts = self._path_parts()
+        if parts == ['status']:
+            snapshot = manager.supervisor.snapshot
+            etag = f'"{snapshot.version}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(snapshot.json)))
+            self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(snapshot.json)
+        elif parts == ['metrics']:
+            body = manager.metrics_text
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif parts == ['diagnostics']:
+            self._send_json(200, manager.diagnostics_report())
+        elif len(parts) == 2 and parts[0] == 'status':
+            info = manager.supervisor.snapshot.bots.get(parts[1])
+            if info is None:
+                self._send_json(404, {'error': f"unknown bot {parts[1]}"})
+            else:
+                info = dict(info)
+                info['uptime'] = int(time.time() - info['started']) if info['started'] else 0
+                self._send_json(200, info)
+        elif len(parts) == 2 and parts[0] == 'archive':
+            if manager.archive is None:
+                self._send_json(404, {'error': 'output archive is disabled'})
+                return
+            query = parse_qs(urlparse(self.path).query)
+            try:
+                start = float(query.get('from', [0])[0])
+                end = float(query.get('to', [time.time()])[0])
+            except ValueError:
+                self._send_json(400, {'error': 'from/to must be unix timestamps'})
+                return
+            lines = [{'ts': ts, 'line': line} for ts, line in manager.archive.read_range(parts[1], start, end)]
+            self._send_json(200, lines)
+        elif parts == ['events']:
+            query = parse_qs(urlparse(self.path).query)
+            bot_folder = query.get('bot', [None])[0]
+            kind = query.get('type', [None])[0]
+            try:
+                since = float(query.get('since', [0])[0])
+            except ValueError:
+                self._send_json(400, {'error': 'since must be a unix timestamp'})
+                return
+            self._send_json(200, [event for event in list(manager.bot_events)
+                                  if event['ts'] >= since and bot_folder in (None, event['bot'])
+                                  and kind in (None, event['type'])])
+        elif len(parts) == 2 and parts[0] == 'history':
+            query = parse_qs(urlparse(self.path).query)
+            try:
+                start = float(query['from'][0]) if 'from' in query else None
+                end = float(query['to'][0]) if 'to' in query else None
+            except ValueError:
+                self._send_json(400, {'error': 'from/to must be unix timestamps'})
+                return
+            fields = ('ts',) + BotHistory.FIELDS
+            self._send_json(200, [dict(zip(fields, row)) for row in manager.metrics_history.rows(parts[1], start, end)])
+        elif parts == ['search']:
+            query = parse_qs(urlparse(self.path).query)
+            pattern = query.get('q', [''])[0]
+            if not pattern:
+                self._send_json(400, {'error': 'missing q'})
+                return
+            limit = self._page_arg(query, 'limit', 100)
+            if limit is None:
+                return
+            try:
+                since = float(query['since'][0]) if 'since' in query else None
+                job = manager.search_logs(pattern, regex=query.get('regex', ['0'])[0] == '1',
+                                          ignore_case=query.get('case', ['0'])[0] != '1', since=since)
+            except (re.error, ValueError) as e:
+                self._send_json(400, {'error': str(e)})
+                return
+            self._send_json(202, job.page(0, limit))
+        elif len(parts) == 2 and parts[0] == 'search':
+            job = manager.log_search.searches.get(parts[1])
+            if job is None:
+                self._send_json(404, {'error': f"unknown search {parts[1]}"})
+                return
+            query = parse_qs(urlparse(self.path).query)
+            offset = self._page_arg(query, 'offset', 0)
+            limit = self._page_arg(query, 'limit', 100) if offset is not None else None
+            if limit is None:
+                return
+            self._send_json(200, job.page(offset, limit))
+        elif parts == ['jobs']:
+            self._send_json(200, [job.to_dict() for job in list(manager.jobs.values())])
+        elif len(parts) == 2 and parts[0] == 'jobs':
+            job = manager.jobs.get(parts[1])
+            if job is None:
+                self._send_json(404, {'error': f"unknown job {parts[1]}"})
+            else:
+                self._send_json(200, job.to_dict())
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        manager = self.server.api.manager
+        parts = self._path_parts()
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+        except ValueError:
+            self._send_json(400, {'error': 'invalid JSON body'})
+            return
+        if not isinstance(body, dict):
+            self._send_json(400, {'error': 'JSON body must be an object'})
+            return
+
+        if len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'cancel':
+            job = manager.jobs.get(parts[1])
+            if job is None:
+                self._send_json(404, {'error': f"unknown job {parts[1]}"})
+            else:
+                job.cancel()
+                self._send_json(200, job.to_dict())
+            return
+
+        if len(parts) == 3 and parts[0] == 'bots':
+            op, bots = parts[2], [parts[1]]
+            if parts[1] not in manager.BOT_FOLDERS:
+                self._send_json(404, {'error': f"unknown bot {parts[1]}"})
+                return
+        elif len(parts) == 2 and parts[0] == 'bulk':
+            # Only a missing "bots" means the whole fleet; [] is an empty job
+            op, bots = parts[1], body.get('bots', list(manager.BOT_FOLDERS))
+            if not isinstance(bots, list):
+                self._send_json(400, {'error': '"bots" must be a list of bot names'})
+                return
+            unknown = [bot for bot in bots if bot not in manager.BOT_FOLDERS]
+            if unknown:
+                self._send_json(400, {'error': f"unknown bots: {', '.join(map(str, unknown))}"})
+                return
+        else:
+            self._send_json(404, {'error': 'not found'})
+            return
+
+        if op not in manager.job_operations():
+            self._send_json(400, {'error': f"unknown operation {op}"})
+            return
+        job = manager.submit_job(op, bots)
+        self._send_json(202, job.to_dict())
+
+class ControlAPI:
+    """Loopback HTTP server exposing bot control as JSON"""
+    def __init__(self, manager, host="127.0.0.1", port=8765, token=""):
+        self.manager = manager
+        self.host = host
+        self.port = port
+        self.token = token
+        self.server = None
+
+    def start(self):
+        self.server = ThreadingHTTPServer((self.host, self.port), ControlRequestHandler)
+        self.server.daemon_threads = True
+        self.server.api = self
+        threading.Thread(target=self.server.serve_forever, name="control-api", daemon=True).start()
+        self.manager.logger.info(f"Control API listening on http://{self.host}:{self.server.server_port}")
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+class BotManager:
+    def __init__(self, log_filemode='w'):
         self.start_time = time.time()
         self.BASE_DIR = ""
         self.BOT_FOLDERS = []
@@ -24,7 +2703,6 @@ class BotManager:
         self.bot_last_uptimes = {}
         self.config_file = "bot_config.json"
         self.log_file = "bot_manager.log"
-        self.log_regex_pattern = r"(Weight|card)"
         
         # Default settings
         self.config = {
@@ -35,26 +2713,131 @@ class BotManager:
             "start_minimized": False,
             "log_level": "INFO",
             "all_bots": self.BOT_FOLDERS.copy(),
-            "capture_output": True
+            "capture_output": True,
+            "metrics_interval": 1.0,
+            "api_enabled": False,
+            "api_host": "127.0.0.1",
+            "api_port": 8765,
+            "api_token": "",
+            "bulk_max_in_flight": 4,
+            "bulk_launches_per_second": 2.0,
+            "restart_intervals": {},  # per-bot override of restart_interval, seconds
+            "restart_jitter": 0.05,  # +/- fraction of the interval
+            "restart_stagger": 30,  # minimum seconds between two scheduled restarts
+            "restart_windows": [],  # e.g. ["02:00-06:00"]; empty means any time
+            "terminal_max_lines": 1000,
+            "log_panel_lines": 50,  # manager log lines kept in the System Logs panel
+            "output_max_lines": 2000,
+            "output_buffer_lines": 1000,  # captured lines kept per bot
+            "output_buffer_bytes": 256 * 1024,
+            "output_encoding": "",  # empty: the system's preferred encoding
+            "archive_enabled": False,
+            "archive_directory": "output_archive",
+            "archive_segment_mb": 8,
+            "archive_segment_minutes": 60,
+            "archive_max_segments": 48,
+            "search_index_file": "log_search_index.json",
+            "log_filter": {"include": ["Weight", "card"], "exclude": [], "ignore_case": True},
+            "terminal_filters": [],  # per terminal, same shape as log_filter; missing ones use it
+            "watchdog_enabled": False,
+            "watchdog_interval": 5,
+            "watchdog_grace_seconds": 120,
+            "watchdog_log_stale_seconds": 300,  # 0 turns a probe off
+            "watchdog_cpu_idle_seconds": 600,
+            "watchdog_cpu_idle_percent": 0.0,
+            "watchdog_log_pattern": "",
+            "watchdog_pattern_seconds": 600,
+            "watchdog_overrides": {},  # per-bot values for the watchdog_* keys above, without the prefix
+            "crash_restart": True,
+            "crash_backoff_initial": 5,  # seconds; doubles with every crash in a row
+            "crash_backoff_max": 300,
+            "crash_stable_seconds": 300,  # a run this long resets the backoff
+            "crash_loop_threshold": 5,  # crashes inside crash_loop_window that stop resurrection
+            "crash_loop_window": 600,
+            "folder_watch": False,  # rescan the base directory for added/removed bot folders
+            "folder_watch_interval": 5,
+            "rename_exe": False,  # compatibility: run bots as start_<bot>.exe and find them by name
+            "state_journal_file": "bot_state.journal",
+            "detach_on_exit": False,  # leave bots running when the manager exits; re-adopted on next start
+            "diagnostics_directory": "diagnostics",  # profile and tracemalloc dumps
+            "profile_seconds": 10
         }
         
         self.load_config()
-        self.setup_logging()
+        self.setup_logging(log_filemode)
+        self.hot_paths = HotPathStats()
+        self.diagnostics = Diagnostics(self.logger, self.config.get("diagnostics_directory", "diagnostics"))
         self.bot_processes = {}
-        self.bot_outputs = defaultdict(list)  # Store bot outputs
-        self.output_queues = {}  # Queues for bot outputs
-        self.restart_timers = {}
+        self.bot_outputs = {}  # bot -> OutputRing of captured output
+        self.output_file_tokens = {}  # bot -> log_tailer token following its output file
         self.system_tray = None
         self.main_window = None
+        self.ui_pump = None
         self.selected_bot = None  # Currently selected bot in treeview
         self.bot_folder_entries = {}  # For setup tab
         self.tree_selection = []  # For multiple selection in treeview
+        self.tree_rows = {}  # bot -> values last written to its Treeview row (iid == bot name)
+        self.log_panel = None  # (log_text widget, FollowedFile of self.log_file)
         self.bot_process_objs = {}
+        self.proc_snapshot = None
+        self.snapshot_max_age = 2.0  # seconds a process snapshot is reused
+        self.snapshot_lock = threading.Lock()
+        self.metrics_sampler = MetricsSampler(self, interval=self.config.get("metrics_interval", 1.0))
+        self.metrics_history = MetricsHistory()
+        self.bot_restarts = defaultdict(int)  # bot -> restarts since the manager started
+        self.bot_crashes = defaultdict(int)  # bot -> exits that nobody asked for
+        self.histograms = {
+            'status_refresh': Histogram(),
+            'start': Histogram(),
+            'kill': Histogram()
+        }
+        self.metrics_text = b""  # Prometheus exposition, rebuilt with every status refresh
+        self.watchdog = Watchdog(self)
+        self.exit_watcher = ExitWatcher(self.logger)
+        self.exit_lock = threading.Lock()  # bot_process_objs ownership: kill_bot vs. exit handling
+        self.bot_exit_codes = {}  # bot -> exit code of its last crash
+        self.bot_events = deque(maxlen=500)  # recent lifecycle events, newest last
+        self.crash_times = defaultdict(deque)  # bot -> crash timestamps inside crash_loop_window
+        self.crash_streaks = defaultdict(int)  # bot -> crashes since it last ran stably
+        self.crash_loops = set()  # bots given up on until someone stops or starts them
+        self.bots_starting = set()  # claimed by start_bot, launch in progress off the supervisor
+        self.folder_scanner = BotFolderScanner()
+        self.registry = ProcessRegistry()
+        self.journal = StateJournal(self.logger, self.config.get("state_journal_file", "bot_state.journal"))
+        self.folder_scan_result = None  # (base_dir, found, error) of a Scan click waiting for the UI
+        self.folder_watch_found = None  # latest differing folder list seen by the watch
+        self.folder_changes_at = 0.0  # when the watch last saw a change, for debouncing
+        self.scanned_bot_folders = set()  # folders the last scan found; only these can vanish
+        self.scheduler = Scheduler(self.logger)
+        self.log_tailer = LogTailer(self.logger, stats=self.hot_paths)
+        self.output_mux = OutputMultiplexer(self.logger, stats=self.hot_paths)
+        self.log_search = LogSearch(self.logger, self.config.get("search_index_file", "log_search_index.json"))
+        self.archive = None
+        if self.config.get("archive_enabled", False):
+            self.archive = OutputArchive(self.logger, self.config.get("archive_directory", "output_archive"),
+                                         segment_bytes=self.config.get("archive_segment_mb", 8) * 1024 * 1024,
+                                         segment_seconds=self.config.get("archive_segment_minutes", 60) * 60,
+                                         max_segments=self.config.get("archive_max_segments", 48))
+        # Every change to bot state runs on this one thread; readers use its snapshots
+        self.supervisor = Supervisor(self.logger, self.collect_status)
+        self.tree_version = None  # snapshot version the Treeview rows were built from
+        self.tree_status = {}  # bot -> (row values without uptime, started, last uptime)
+        self.jobs = {}  # job id -> Job, oldest first
+        self.job_ids = itertools.count(1)
+        self.job_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job")
+        # Single-bot jobs (auto-restarts, resurrections, watchdog) never wait behind a bulk job
+        self.single_job_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-single")
+        self.max_finished_jobs = 200
+        self.control_api = None
+        self.bulk = BulkOrchestrator(self,
+                                     max_in_flight=self.config.get("bulk_max_in_flight", 4),
+                                     launches_per_second=self.config.get("bulk_launches_per_second", 2.0))
+        self.active_bulk_job = None  # job shown in the Bot Control progress label
         
-    def setup_logging(self):
+    def setup_logging(self, filemode='w'):
         logging.basicConfig(
             filename=self.log_file,
-            filemode='w',
+            filemode=filemode,
             level=getattr(logging, self.config["log_level"]),
             format='%(asctime)s - %(levelname)s - %(message)s'
         )
@@ -71,6 +2854,12 @@ class BotManager:
                     self.BOT_FOLDERS = self.config.get("bot_folders", self.BOT_FOLDERS)
         except Exception as e:
             print(f"Error loading config: {e}")
+        # Parsed once here, so a bad entry is reported at load and never fails a start
+        try:
+            self.restart_windows = parse_windows(self.config.get("restart_windows"))
+        except ValueError as e:
+            print(f"Error loading config: {e}; restart windows ignored")
+            self.restart_windows = []
             
     def save_config(self):
         try:
@@ -89,145 +2878,370 @@ class BotManager:
     def get_start_path(self, bot_folder):
         return os.path.join(self.BASE_DIR, bot_folder, "start.exe")
 
+    def get_output_ring(self, bot_folder):
+        ring = self.bot_outputs.get(bot_folder)
+        if ring is None:
+            ring = OutputRing(self.config.get("output_buffer_lines", 1000),
+                              self.config.get("output_buffer_bytes", 256 * 1024))
+            self.bot_outputs[bot_folder] = ring
+        return ring
+
+    def get_output_file_path(self, bot_folder):
+        """Where a bot launched with detach_on_exit writes its stdout"""
+        return os.path.join(self.BASE_DIR, bot_folder, "logs", "koremanager_output.txt")
+
     def capture_bot_output(self, bot_folder, process):
-        """Capture bot output in a separate thread"""
-        def read_output():
-            try:
-                while process.poll() is None:
-                    output = process.stdout.readline()
-                    if output:
-                        decoded_output = output.strip()
-                        if decoded_output:
-                            timestamp = datetime.now().strftime("%H:%M:%S")
-                            formatted_output = f"[{timestamp}] {decoded_output}"
-                            self.bot_outputs[bot_folder].append(formatted_output)
-                            
-                            # Keep only last 100 lines per bot
-                            if len(self.bot_outputs[bot_folder]) > 100:
-                                self.bot_outputs[bot_folder] = self.bot_outputs[bot_folder][-100:]
-                            
-                            # Add to queue for UI update
-                            if bot_folder in self.output_queues:
-                                try:
-                                    self.output_queues[bot_folder].put(formatted_output, block=False)
-                                except queue.Full:
-                                    pass
-            except Exception as e:
-                self.logger.error(f"Error capturing output for {bot_folder}: {e}")
-        
+        """Hand the bot's stdout pipe to the shared output multiplexer"""
         if self.config.get("capture_output", True):
-            output_thread = threading.Thread(target=read_output, daemon=True)
-            output_thread.start()
+            encoding = self.config.get("output_encoding") or locale.getpreferredencoding(False)
+            try:
+                codecs.lookup(encoding)
+            except LookupError:
+                encoding = "utf-8"
+            self.output_mux.add(PipeStream(bot_folder, process, encoding, self.output_sink(bot_folder)))
 
-    def start_log_tail(self, bot_folder, text_widget, regex_pattern=None):
-        if regex_pattern is None:
-            regex_pattern = self.log_regex_pattern
+    def capture_bot_file(self, bot_folder):
+        """Follow the bot's output file from its current end, replacing an earlier follow"""
+        token = self.output_file_tokens.pop(bot_folder, None)
+        if token is not None:
+            self.log_tailer.unsubscribe(token)
+        self.output_file_tokens[bot_folder] = self.log_tailer.subscribe(self.get_output_file_path(bot_folder),
+                                                                        self.output_sink(bot_folder))
+
+    def output_sink(self, bot_folder):
+        """on_lines callback feeding captured lines into the bot's ring and the archive"""
+        ring = self.get_output_ring(bot_folder)
+
+        def on_lines(lines):
+            # One timestamp per chunk instead of one strftime per line
+            now = time.time()
+            timestamp = datetime.fromtimestamp(now).strftime("%H:%M:%S")
+            kept = [line.strip() for line in lines if line.strip()]
+            self.hot_paths.count('captured_lines', len(kept))
+            for line in kept:
+                ring.append(f"[{timestamp}] {line}")
+            if self.archive is not None and kept:
+                self.archive.append(bot_folder, now, kept)
+
+        return on_lines
+
+    def start_log_tail(self, bot_folder, text_widget, filter_set=None):
+        """Follow a bot's console.txt into text_widget; returns a token for stop_log_tail"""
+        if filter_set is None:
+            filter_set = FilterSet.from_config(self.config.get("log_filter"))
         log_path = os.path.join(self.BASE_DIR, bot_folder, "logs", "console.txt")
-        def tail():
-            try:
-                with open(log_path, "r", encoding="utf-8") as f:
-                    f.seek(0, os.SEEK_END)  # Começa do final do arquivo!
-                    while text_widget.winfo_exists():
-                        where = f.tell()
-                        line = f.readline()
-                        if not line:
-                            time.sleep(1)
-                            f.seek(where)
-                        else:
-                            if re.search(regex_pattern, line, re.IGNORECASE):
-                                text_widget.insert("end", line)
-                                text_widget.see("end")
-            except Exception as e:
-                self.logger.error(f"Error tailing log for {bot_folder}: {e}")
 
-        t = threading.Thread(target=tail, daemon=True)
-        t.start()
+        def deliver(lines):
+            # Runs on the tailer thread: never touch the widget here
+            shown = filter_set.apply(bot_folder, lines)
+            if shown:
+                self.ui_pump.push(text_widget, shown)
+
+        return self.log_tailer.subscribe(log_path, deliver)
+
+    def stop_log_tail(self, token):
+        if token is not None:
+            self.log_tailer.unsubscribe(token)
 
     def reset_bot_log(self, bot_folder, text_widget):
         log_path = os.path.join(self.BASE_DIR, bot_folder, "logs", "console.txt")
         try:
             with open(log_path, "w", encoding="utf-8") as f:
                 f.truncate(0)
+            if self.ui_pump:
+                self.ui_pump.clear(text_widget)
             text_widget.delete(1.0, "end")
             self.logger.info(f"Log reset for {bot_folder}")
         except Exception as e:
             self.logger.error(f"Error resetting log for {bot_folder}: {e}")
 
-    def is_bot_running(self, bot_folder):
-        exe_name = f"start_{bot_folder}.exe"
+    def take_process_snapshot(self):
+        """Walk the process table once and index it by name and PID"""
+        by_name = {}
+        procs = {}
         for proc in psutil.process_iter(['name', 'pid']):
             try:
-                if proc.info['name'] and proc.info['name'].lower() == exe_name.lower():
-                    self.bot_processes[bot_folder] = proc.info['pid']
-                    return True
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                name = proc.info['name']
+                if not name:
+                    continue
+                pid = proc.info['pid']
+                by_name.setdefault(name.lower(), []).append(pid)
+                procs[pid] = proc
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return ProcessSnapshot(time.time(), by_name, procs)
+
+    def get_process_snapshot(self, force=False):
+        """Return the shared snapshot, rebuilding it when stale or when forced"""
+        with self.snapshot_lock:
+            snapshot = self.proc_snapshot
+            if force or snapshot is None or snapshot.age() > self.snapshot_max_age:
+                snapshot = self.take_process_snapshot()
+                self.proc_snapshot = snapshot
+            return snapshot
+
+    def lookup_snapshot(self, force=False):
+        """Process sweep for finding bots by name; only needed in rename_exe mode"""
+        if not self.config.get("rename_exe", False):
+            return None
+        return self.get_process_snapshot(force)
+
+    @supervised
+    def is_bot_running(self, bot_folder, snapshot=None):
+        """Registry lookup; a snapshot (given, or taken in rename_exe mode) also finds unregistered bots"""
+        identity = self.registry.alive(bot_folder)
+        if identity is not None:
+            self.bot_processes[bot_folder] = identity.pid
+            return True
+        if self.registry.get(bot_folder) is not None:
+            self.registry.forget(bot_folder)
+        if snapshot is None:
+            snapshot = self.lookup_snapshot()
+        if snapshot is not None and self.adopt_bot_process(bot_folder, snapshot):
+            self.bot_processes[bot_folder] = self.registry.get(bot_folder).pid
+            return True
+        return False
+
+    def adopt_bot_process(self, bot_folder, snapshot):
+        """Find a bot this manager didn't launch in a sweep and register it"""
+        cwd = os.path.normcase(os.path.abspath(os.path.join(self.BASE_DIR, bot_folder)))
+        start_path = os.path.normcase(os.path.abspath(self.get_start_path(bot_folder)))
+        # Renamed executables are unique by name; plain start.exe is looked up by path
+        candidates = list(snapshot.locate(f"start_{bot_folder}.exe").values())
+        located = snapshot.locate("start.exe", skip=self.registry.owner)
+        candidates += [located[key] for key in (cwd, start_path) if key in located]
+        for pid, exe, proc_cwd, proc in candidates:
+            if self.registry.owner(pid) not in (None, bot_folder):
+                continue
+            try:
+                self.registry.register(bot_folder, pid, exe, proc_cwd, proc)
+                return True
+            except psutil.Error:
                 continue
         return False
 
-    def start_bot(self, bot_folder, visible=False):
-        try:
-            if self.is_bot_running(bot_folder):
-                self.logger.info(f"Bot {bot_folder} is already running")
-                return False
+    def adopt_running_bots(self, supervise=True):
+        """One sweep that registers configured bots already running outside this manager"""
+        snapshot = self.get_process_snapshot(force=True)
+        adopted = [bot_folder for bot_folder in list(self.BOT_FOLDERS)
+                   if self.registry.alive(bot_folder) is None and self.adopt_bot_process(bot_folder, snapshot)]
+        for bot_folder in adopted:
+            identity = self.registry.get(bot_folder)
+            if supervise:
+                self.track_adopted_bot(bot_folder, identity, identity.create_time, None)
+            else:
+                self.bot_processes[bot_folder] = identity.pid
+        if adopted and supervise:
+            self.logger.info(f"Adopted running bots: {', '.join(adopted)}")
+        return adopted
 
-            exe_path = self.get_exe_path(bot_folder)
-            start_path = self.get_start_path(bot_folder)
+    def track_adopted_bot(self, bot_folder, identity, started, mode, restart_due=None):
+        """Supervise a registered process this manager didn't launch like one it did"""
+        process = AdoptedProcess(identity.handle)
+        with self.exit_lock:
+            self.bot_process_objs[bot_folder] = process
+        self.exit_watcher.watch(process, lambda process, returncode: self.on_bot_exit(bot_folder, process, returncode))
+        self.bot_processes[bot_folder] = identity.pid
+        self.bot_start_times[bot_folder] = started
+        self.bot_last_uptimes[bot_folder] = 0
+        if self.config.get("capture_output", True) and os.path.exists(self.get_output_file_path(bot_folder)):
+            self.capture_bot_file(bot_folder)  # launched with detach_on_exit by an earlier manager
+        if mode:
+            if not hasattr(self, 'bot_console_mode'):
+                self.bot_console_mode = {}
+            self.bot_console_mode[bot_folder] = mode
+        self.journal.record_start(bot_folder, identity.pid, identity.create_time, identity.exe,
+                                  identity.cwd, started, mode)
+        if self.config["auto_restart"]:
+            self.schedule_restart(bot_folder, due=max(restart_due, time.time()) if restart_due else None)
 
-            # Renomeia start.exe para start_<bot_folder>.exe se necessário
-            if os.path.exists(start_path):
-                if os.path.exists(exe_path):
-                    os.remove(exe_path)  # Remove se já existir
-                os.rename(start_path, exe_path)
+    @supervised
+    def restore_state(self, supervise=True):
+        """Re-adopt the bots the journal says are running, then sweep once for any others.
 
-            if not os.path.exists(exe_path):
-                self.logger.error(f"Executable not found: {exe_path}")
-                return False
+        With supervise=False (one-shot commands) bots are only registered so
+        they can be found; nothing is watched, scheduled or journaled.
+        """
+        adopted = []
+        for bot_folder, record in self.journal.load().items():
+            try:
+                proc = psutil.Process(record["pid"])
+                # A different create_time means the PID now belongs to another process
+                if abs(proc.create_time() - record["create_time"]) > 0.01 or bot_folder not in self.BOT_FOLDERS:
+                    raise psutil.NoSuchProcess(record["pid"])
+                identity = self.registry.register(bot_folder, record["pid"], record.get("exe"), record.get("cwd"), proc)
+            except (psutil.Error, KeyError, TypeError):
+                if supervise:
+                    self.journal.record_stop(bot_folder)
+                continue
+            adopted.append(bot_folder)
+            if not supervise:
+                self.bot_processes[bot_folder] = identity.pid
+                continue
+            self.track_adopted_bot(bot_folder, identity, record.get("started") or identity.create_time,
+                                   record.get("mode"), record.get("restart_due"))
+        if supervise:
+            self.journal.compact()
+            if adopted:
+                self.logger.info(f"Re-adopted bots from the state journal: {', '.join(adopted)}")
+        self.adopt_running_bots(supervise)
+        return adopted
 
-            cwd = os.path.join(self.BASE_DIR, bot_folder)
+    @supervised
+    def detach_bots(self):
+        """Exit without stopping bots; the journal lets the next manager re-adopt them"""
+        running = [bot_folder for bot_folder in list(self.bot_process_objs) if self.registry.alive(bot_folder)]
+        # Launched before detach_on_exit was set; bots writing to their output file are fine
+        piped = [bot_folder for bot_folder in running
+                 if getattr(self.bot_process_objs.get(bot_folder), 'stdout', None) is not None]
+        if piped:
+            self.logger.warning(f"Detaching bots whose output was captured; their stdout pipe closes: {', '.join(piped)}")
+        self.logger.info(f"Leaving {len(running)} bots running")
+        self.journal.compact()
 
+    @hot_path('start_bot')
+    def start_bot(self, bot_folder, visible=False):
+        began = time.time()
+        launch = self.claim_bot_start(bot_folder)
+        if launch is None:
+            return False
+        exe_path, cwd = launch
+        try:
+            # Popen and the pipe hand-off run on the caller's thread, so a bulk job
+            # really launches bulk_max_in_flight bots at a time; only the
+            # bookkeeping before and after goes through the supervisor
             if visible:
                 process = subprocess.Popen(
                     [exe_path],
                     cwd=cwd,
                     creationflags=0
                 )
-                self.bot_process_objs[bot_folder] = process
                 console_mode = 'WINDOW'
+            elif not self.config.get("capture_output", True):
+                # Nobody reads the pipe, so don't let a full pipe stall the bot
+                process = subprocess.Popen(
+                    [exe_path],
+                    cwd=cwd,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    creationflags=CREATE_NO_WINDOW
+                )
+                console_mode = 'NO_WINDOW'
+            elif self.config.get("detach_on_exit", False):
+                # A pipe would break once the manager exits and leaves the bot
+                # running, so the output goes to a file that is followed instead
+                output_path = self.get_output_file_path(bot_folder)
+                os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                with open(output_path, "wb") as output:
+                    self.capture_bot_file(bot_folder)
+                    process = subprocess.Popen(
+                        [exe_path],
+                        cwd=cwd,
+                        stdin=subprocess.DEVNULL,
+                        stdout=output,
+                        stderr=subprocess.STDOUT,
+                        creationflags=CREATE_NO_WINDOW
+                    )
+                console_mode = 'NO_WINDOW'
             else:
                 process = subprocess.Popen(
                     [exe_path],
                     cwd=cwd,
                     stdout=subprocess.PIPE,
                     stderr=subprocess.STDOUT,
-                    creationflags=subprocess.CREATE_NO_WINDOW,
-                    text=True,
-                    bufsize=1
+                    creationflags=CREATE_NO_WINDOW
                 )
-                self.bot_process_objs[bot_folder] = process
                 self.capture_bot_output(bot_folder, process)
                 console_mode = 'NO_WINDOW'
+        except Exception as e:
+            self.release_bot_start(bot_folder)
+            self.logger.error(f"Error starting bot {bot_folder}: {e}")
+            return False
+        try:
+            handle = psutil.Process(process.pid)
+        except psutil.Error:
+            handle = None  # already gone; the exit watcher reports it
+        self.finish_bot_start(bot_folder, process, handle, exe_path, cwd, console_mode)
+        self.histograms['start'].observe(time.time() - began)
+        return True
 
+    @supervised
+    def claim_bot_start(self, bot_folder):
+        """Check and reserve a start of bot_folder; (exe path, cwd) to launch, or None"""
+        try:
+            if bot_folder in self.bots_starting or self.is_bot_running(bot_folder):
+                self.logger.info(f"Bot {bot_folder} is already running")
+                return None
+
+            start_path = self.get_start_path(bot_folder)
+            rename = self.config.get("rename_exe", False)
+            exe_path = self.get_exe_path(bot_folder) if rename else start_path
+
+            # Renomeia start.exe para start_<bot_folder>.exe se necessário (modo compatibilidade)
+            if rename and os.path.exists(start_path):
+                if os.path.exists(exe_path):
+                    os.remove(exe_path)  # Remove se já existir
+                os.rename(start_path, exe_path)
+
+            if not os.path.exists(exe_path):
+                self.logger.error(f"Executable not found: {exe_path}")
+                return None
+        except Exception as e:
+            self.logger.error(f"Error starting bot {bot_folder}: {e}")
+            return None
+        self.bots_starting.add(bot_folder)
+        return exe_path, os.path.join(self.BASE_DIR, bot_folder)
+
+    @supervised
+    def release_bot_start(self, bot_folder):
+        self.bots_starting.discard(bot_folder)
+
+    @supervised
+    def finish_bot_start(self, bot_folder, process, handle, exe_path, cwd, console_mode):
+        """Record a launched bot: watch, register, journal and schedule it"""
+        self.bots_starting.discard(bot_folder)
+        rename = self.config.get("rename_exe", False)
+        start_path = self.get_start_path(bot_folder)
+        try:
+            self.bot_process_objs[bot_folder] = process
             self.bot_processes[bot_folder] = process.pid
+            self.exit_watcher.watch(process, lambda process, returncode: self.on_bot_exit(bot_folder, process, returncode))
+            if bot_folder in self.crash_loops:
+                self.clear_crash_state(bot_folder)  # started by hand: give it a fresh budget
+            proc = None
+            if handle is not None:
+                try:
+                    proc = self.registry.register(bot_folder, process.pid, exe_path, cwd, handle).handle
+                except psutil.Error:
+                    pass  # already gone; the exit watcher reports it
+            if rename:
+                self.get_process_snapshot().add(os.path.basename(exe_path), process.pid, proc)
             if not hasattr(self, 'bot_console_mode'):
                 self.bot_console_mode = {}
             self.bot_console_mode[bot_folder] = console_mode
-            self.output_queues[bot_folder] = queue.Queue(maxsize=50)
-            # Renomeia de volta após 5 segundos
-            threading.Timer(5, lambda: self.rename_back(exe_path, start_path)).start()
+            if rename:
+                # Renomeia de volta após 5 segundos
+                self.scheduler.schedule(f"rename:{bot_folder}", 5, lambda: self.rename_back(exe_path, start_path),
+                                        label="rename back")
             self.logger.info(f"Bot {bot_folder} started with PID {process.pid}")
+            self.record_event(bot_folder, 'start', pid=process.pid)
 
             # UPTIME: marca início e zera uptime congelado
             self.bot_start_times[bot_folder] = time.time()
             self.bot_last_uptimes[bot_folder] = 0
-
-            if self.config["auto_restart"]:
-                self.schedule_restart(bot_folder)
-
-            return True
+            if proc is not None:
+                identity = self.registry.get(bot_folder)
+                self.journal.record_start(bot_folder, identity.pid, identity.create_time, exe_path, cwd,
+                                          self.bot_start_times[bot_folder], console_mode)
 
         except Exception as e:
-            self.logger.error(f"Error starting bot {bot_folder}: {e}")
-            return False
+            self.logger.error(f"Error recording start of bot {bot_folder}: {e}")
+        if self.config["auto_restart"]:
+            try:
+                self.schedule_restart(bot_folder)
+            except Exception as e:
+                self.logger.error(f"Error scheduling restart of bot {bot_folder}: {e}")
 
     def rename_back(self, exe_path, start_path):
         try:
@@ -236,27 +3250,63 @@ class BotManager:
         except Exception as e:
             self.logger.error(f"Error renaming file: {e}")
 
+    @hot_path('kill_bot')
     def kill_bot(self, bot_folder):
+        began = time.time()
+        killed, process = self.stop_bot_process(bot_folder)
+        # Nobody else waits on the handle any more: reap it so it isn't left a zombie.
+        # This happens off the supervisor so a slow exit never holds up other commands.
+        if process is not None and killed:
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                pass
+        if killed:
+            self.histograms['kill'].observe(time.time() - began)
+        return killed
+
+    @supervised
+    def stop_bot_process(self, bot_folder):
+        """Forget the bot and send the kill; (killed, process handle to reap)"""
+        process = None
         try:
             exe_name = f"start_{bot_folder}.exe"
             killed = False
 
-            for proc in psutil.process_iter(['pid', 'name']):
+            # A deliberate stop: take the handle away from the exit watcher before
+            # killing, so this exit is never counted as a crash
+            with self.exit_lock:
+                process = self.bot_process_objs.pop(bot_folder, None)
+            if process is not None:
+                self.exit_watcher.unwatch(process)
+            self.scheduler.cancel(f"resurrect:{bot_folder}")
+            self.clear_crash_state(bot_folder)
+
+            identity = self.registry.alive(bot_folder)
+            self.registry.forget(bot_folder)
+            if identity is not None:
                 try:
-                    if proc.info['name'] and proc.info['name'].lower() == exe_name.lower():
+                    identity.handle.kill()
+                    killed = True
+                    self.logger.info(f"Bot {bot_folder} terminated")
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    pass
+            snapshot = self.lookup_snapshot()
+            if snapshot is not None:
+                # rename_exe mode: also catch copies started outside this manager
+                for pid in snapshot.pids_for(exe_name):
+                    try:
+                        proc = snapshot.procs.get(pid) or psutil.Process(pid)
                         proc.kill()
                         killed = True
                         self.logger.info(f"Bot {bot_folder} terminated")
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    continue
+                    except (psutil.NoSuchProcess, psutil.AccessDenied):
+                        continue
+                snapshot.discard(exe_name)
 
             if bot_folder in self.bot_processes:
                 del self.bot_processes[bot_folder]
-            if bot_folder in self.restart_timers:
-                self.restart_timers[bot_folder].cancel()
-                del self.restart_timers[bot_folder]
-            if bot_folder in self.output_queues:
-                del self.output_queues[bot_folder]
+            self.cancel_restart(bot_folder)
             # Zera o modo do console ao parar o bot
             if hasattr(self, 'bot_console_mode') and bot_folder in self.bot_console_mode:
                 del self.bot_console_mode[bot_folder]
@@ -264,11 +3314,14 @@ class BotManager:
             if bot_folder in self.bot_start_times:
                 self.bot_last_uptimes[bot_folder] = int(time.time() - self.bot_start_times[bot_folder])
                 del self.bot_start_times[bot_folder]
-            return killed
+            self.journal.record_stop(bot_folder)
+            if killed:
+                self.record_event(bot_folder, 'stop')
+            return killed, process
 
         except Exception as e:
             self.logger.error(f"Error terminating bot {bot_folder}: {e}")
-            return False
+            return False, None
 
     def kill_all_bots(self):
         killed_count = 0
@@ -280,10 +3333,15 @@ class BotManager:
         return killed_count
 
     def restart_bot(self, bot_folder):
+        self.count_restart(bot_folder)
         self.kill_bot(bot_folder)
         time.sleep(2)
         return self.start_bot(bot_folder)
 
+    @supervised
+    def count_restart(self, bot_folder):
+        self.bot_restarts[bot_folder] += 1
+
     def restart_all_bots(self):
         # Kill all bots first
         for bot_folder in self.config["all_bots"]:
@@ -299,34 +3357,272 @@ class BotManager:
         self.logger.info(f"{started_count} bots restarted")
         return started_count
 
-    def schedule_restart(self, bot_folder):
+    def restart_interval_for(self, bot_folder):
+        return self.config.get("restart_intervals", {}).get(bot_folder, self.config["restart_interval"])
+
+    def next_restart_time(self, bot_folder, now=None):
+        """Interval plus jitter, pushed into a restart window and away from other restarts"""
+        now = time.time() if now is None else now
+        interval = self.restart_interval_for(bot_folder)
+        jitter = self.config.get("restart_jitter", 0)
+        due = now + interval * (1 + random.uniform(-jitter, jitter))
+        windows = self.restart_windows
+        stagger = self.config.get("restart_stagger", 0)
+        due = next_in_windows(due, windows)
+        if stagger > 0:
+            for other_due, key, _ in self.scheduler.pending("restart:"):
+                if key == f"restart:{bot_folder}" or other_due + stagger <= due:
+                    continue
+                if other_due - stagger >= due:
+                    break
+                due = next_in_windows(other_due + stagger, windows)
+        return due
+
+    @supervised
+    def schedule_restart(self, bot_folder, due=None):
         if not self.config["auto_restart"]:
             return
-            
-        if bot_folder in self.restart_timers:
-            self.restart_timers[bot_folder].cancel()
-            
-        timer = threading.Timer(self.config["restart_interval"], 
-                              lambda: self.restart_bot(bot_folder))
-        timer.daemon = True
-        timer.start()
-        self.restart_timers[bot_folder] = timer
+        if due is None:
+            due = self.next_restart_time(bot_folder)
+        # The restart itself goes through the job queue so it never blocks the scheduler
+        self.scheduler.schedule_at(f"restart:{bot_folder}", due,
+                                   lambda: self.submit_job('restart', [bot_folder]),
+                                   label="auto-restart")
+        self.journal.record_restart(bot_folder, due)
+
+    @supervised
+    def cancel_restart(self, bot_folder):
+        return self.scheduler.cancel(f"restart:{bot_folder}")
+
+    def reap_exited_bots(self):
+        """Fallback for exits the exit watcher hasn't reported yet"""
+        for bot_folder, process in list(self.bot_process_objs.items()):
+            exited, returncode = poll_exit(process)
+            if exited:
+                self.exit_watcher.unwatch(process)
+                self.on_bot_exit(bot_folder, process, returncode)
+
+    def on_bot_exit(self, bot_folder, process, returncode):
+        """Queue the exit for the supervisor; never blocks the reporting thread"""
+        self.supervisor.submit('exit', self.handle_bot_exit, bot_folder, process, returncode)
+
+    def record_event(self, bot_folder, kind, **details):
+        """Remember a lifecycle event: start, stop, crash, resurrect or crash-loop"""
+        event = {'ts': time.time(), 'bot': bot_folder, 'type': kind}
+        event.update(details)
+        self.bot_events.append(event)
+        return event
+
+    def handle_bot_exit(self, bot_folder, process, returncode):
+        """A launched bot exited without kill_bot: record the crash and bring it back"""
+        with self.exit_lock:
+            if self.bot_process_objs.get(bot_folder) is not process:
+                return  # stopped on purpose or already handled
+            # Processo já morreu sem kill_bot: conta como crash
+            del self.bot_process_objs[bot_folder]
+            self.bot_crashes[bot_folder] += 1
+            self.bot_exit_codes[bot_folder] = returncode
+            if self.bot_processes.get(bot_folder) == process.pid:
+                del self.bot_processes[bot_folder]
+            self.registry.forget(bot_folder, process.pid)
+            with self.snapshot_lock:
+                if self.proc_snapshot is not None:
+                    # Don't let a cached sweep keep the dead PID "running"
+                    self.proc_snapshot.discard(f"start_{bot_folder}.exe", process.pid)
+            visible = getattr(self, 'bot_console_mode', {}).pop(bot_folder, None) == 'WINDOW'
+            # UPTIME: congela o uptime ao morrer
+            ran_for = 0
+            if bot_folder in self.bot_start_times:
+                ran_for = int(time.time() - self.bot_start_times.pop(bot_folder))
+                self.bot_last_uptimes[bot_folder] = ran_for
+        self.cancel_restart(bot_folder)
+        self.journal.record_stop(bot_folder)
+        adopted = isinstance(process, AdoptedProcess)
+        # An adopted bot isn't our child, so its exit code can't be collected
+        exit_text = "an unknown exit code (adopted)" if adopted else f"exit code {returncode}"
+        self.logger.warning(f"Bot {bot_folder} crashed with {exit_text} after {ran_for}s")
+        self.record_event(bot_folder, 'crash', pid=process.pid, exit_code=returncode, adopted=adopted, ran_for=ran_for)
+        self.schedule_resurrection(bot_folder, ran_for, visible)
+
+    def schedule_resurrection(self, bot_folder, ran_for, visible=False):
+        """Restart a crashed bot after a capped exponential backoff, unless it is crash-looping"""
+        if not self.config.get("crash_restart", True):
+            return
+        now = time.time()
+        crashes = self.crash_times[bot_folder]
+        crashes.append(now)
+        window = self.config.get("crash_loop_window", 600)
+        while crashes and crashes[0] < now - window:
+            crashes.popleft()
+        if ran_for >= self.config.get("crash_stable_seconds", 300):
+            self.crash_streaks[bot_folder] = 0
+        self.crash_streaks[bot_folder] += 1
+        if len(crashes) >= self.config.get("crash_loop_threshold", 5):
+            self.crash_loops.add(bot_folder)
+            self.logger.error(f"Bot {bot_folder} is crash-looping ({len(crashes)} crashes in {window}s); not restarting it")
+            self.record_event(bot_folder, 'crash-loop', crashes=len(crashes))
+            return
+        delay = min(self.config.get("crash_backoff_max", 300),
+                    self.config.get("crash_backoff_initial", 5) * 2 ** (self.crash_streaks[bot_folder] - 1))
+        self.logger.info(f"Restarting crashed bot {bot_folder} in {delay}s")
+        self.scheduler.schedule(f"resurrect:{bot_folder}", delay,
+                                lambda: self.resurrect_bot(bot_folder, visible), label="resurrect")
+
+    def resurrect_bot(self, bot_folder, visible=False):
+        self.record_event(bot_folder, 'resurrect', attempt=self.crash_streaks[bot_folder])
+        return self.submit_job('start', [bot_folder], visible=visible)
+
+    def clear_crash_state(self, bot_folder):
+        self.crash_times.pop(bot_folder, None)
+        self.crash_streaks.pop(bot_folder, None)
+        self.crash_loops.discard(bot_folder)
+
+    def refresh_status_cache(self, snapshot=None):
+        """Publish a fresh status snapshot (a new version only if it changed) and rebuild /metrics"""
+        published = self.supervisor.call('refresh', self.supervisor.publish, snapshot)
+        self.metrics_text = self.render_metrics(published)
+        return published
+
+    def collect_status(self, snapshot=None):
+        """Everything the UI, tray and API show about each bot; runs on the supervisor.
+
+        Holds start times rather than uptimes, so an unchanged bot compares
+        equal between refreshes and no new version is published for it.
+        """
+        status = self.get_bot_status(snapshot)
+        for bot_folder, info in status.items():
+            sample = self.metrics_sampler.get(bot_folder, info['pid']) if info['pid'] else None
+            started = self.bot_start_times.get(bot_folder)
+            info['console'] = getattr(self, 'bot_console_mode', {}).get(bot_folder)
+            info['rss'] = sample['rss'] if sample else None
+            info['cpu_percent'] = sample['cpu'] if sample else None
+            info['started'] = started if info['running'] else None
+            info['last_uptime'] = self.bot_last_uptimes.get(bot_folder, 0)
+            info['restarts'] = self.bot_restarts.get(bot_folder, 0)
+            info['crashes'] = self.bot_crashes.get(bot_folder, 0)
+            info['health'] = self.watchdog.health(bot_folder)
+            info['exit_code'] = self.bot_exit_codes.get(bot_folder)
+            info['crash_loop'] = bot_folder in self.crash_loops
+            info['next_resurrect'] = self.scheduler.due(f"resurrect:{bot_folder}")
+            info['watchdog_restarts'] = self.watchdog.restarts.get(bot_folder, 0)
+        return status
+
+    def render_metrics(self, snapshot):
+        """Prometheus text exposition of a status snapshot plus the manager's own histograms"""
+        now = time.time()
+        per_bot = (
+            ('koremanager_bot_up', 'gauge', 'Whether the bot process is running', lambda info: 1 if info['running'] else 0),
+            ('koremanager_bot_restarts_total', 'counter', 'Restarts since the manager started', lambda info: info['restarts']),
+            ('koremanager_bot_crashes_total', 'counter', 'Unexpected exits since the manager started', lambda info: info['crashes']),
+            ('koremanager_bot_watchdog_restarts_total', 'counter', 'Restarts triggered by failed liveness probes', lambda info: info['watchdog_restarts']),
+            ('koremanager_bot_cpu_percent', 'gauge', 'CPU usage of the bot process', lambda info: info['cpu_percent']),
+            ('koremanager_bot_rss_bytes', 'gauge', 'Resident memory of the bot process', lambda info: info['rss']),
+            ('koremanager_bot_uptime_seconds', 'gauge', 'Seconds since the bot was started',
+             lambda info: int(now - info['started']) if info['started'] else 0)
+        )
+        lines = []
+        for name, kind, help_text, value_of in per_bot:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for bot_folder, info in snapshot.bots.items():
+                value = value_of(info)
+                if value is not None:
+                    lines.append(f'{name}{{bot="{prometheus_label(bot_folder)}"}} {value}')
+        lines.append("# HELP koremanager_uptime_seconds Seconds since the manager started")
+        lines.append("# TYPE koremanager_uptime_seconds gauge")
+        lines.append(f"koremanager_uptime_seconds {int(now - self.start_time)}")
+        lines += self.histograms['status_refresh'].render('koremanager_status_refresh_seconds', 'Duration of one metrics and status refresh')
+        lines += self.histograms['start'].render('koremanager_bot_start_seconds', 'Time taken to launch a bot')
+        lines += self.histograms['kill'].render('koremanager_bot_kill_seconds', 'Time taken to kill a bot')
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+    def job_operations(self):
+        return {
+            'start': self.start_bot,
+            'stop': lambda bot_folder, **options: self.kill_bot(bot_folder),
+            'restart': lambda bot_folder, **options: self.restart_bot(bot_folder)
+        }
+
+    def submit_job(self, op, bots, **options):
+        """Queue an operation and return its Job right away; poll it by id"""
+        job = Job(str(next(self.job_ids)), op, bots, options)
+        self.jobs[job.id] = job
+        finished = [j for j in list(self.jobs.values()) if j.finished]
+        for old in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            self.jobs.pop(old.id, None)
+        executor = self.single_job_executor if len(job.bots) == 1 else self.job_executor
+        executor.submit(self.run_job, job)
+        return job
+
+    def run_job(self, job):
+        # Bulk jobs run one at a time so two of them never race on the same bot;
+        # their bots fan out over the orchestrator's pool. Single-bot jobs run
+        # on their own queue and thread, off the pool and the launch rate limit.
+        action = self.job_operations()[job.op]
+        if job.cancel_event.is_set():
+            job.state = 'cancelled'
+            job.finished = time.time()
+            return
+        job.state = 'running'
+        try:
+            if len(job.bots) == 1:
+                self.bulk.run_now(job, action)
+            else:
+                self.bulk.run(job, action)
+            # A cancel that arrives after the last bot finished still leaves the job done
+            job.state = 'cancelled' if job.cancel_event.is_set() and len(job.results) < len(job.bots) else 'done'
+            done, ok, total = job.progress()
+            self.logger.info(f"Job {job.id} {job.op}: {ok}/{total} succeeded ({job.state})")
+        except Exception as e:
+            job.error = str(e)
+            job.state = 'failed'
+            self.logger.error(f"Job {job.id} ({job.op}) failed: {e}")
+        job.finished = time.time()
+
+    def start_control_api(self):
+        if self.control_api is not None:
+            return
+        try:
+            self.control_api = ControlAPI(self,
+                                          host=self.config.get("api_host", "127.0.0.1"),
+                                          port=self.config.get("api_port", 8765),
+                                          token=self.config.get("api_token", ""))
+            self.control_api.start()
+        except OSError as e:
+            self.control_api = None
+            self.logger.error(f"Error starting control API: {e}")
+
+    def stop_control_api(self):
+        if self.control_api is not None:
+            self.control_api.stop()
+            self.control_api = None
+
+    def console_log_paths(self):
+        return {bot_folder: os.path.join(self.BASE_DIR, bot_folder, "logs", "console.txt")
+                for bot_folder in self.BOT_FOLDERS}
+
+    def search_logs(self, pattern, regex=False, ignore_case=True, since=None):
+        """Search every bot's console.txt; returns a SearchJob to page through"""
+        return self.log_search.search(self.console_log_paths(), pattern, regex, ignore_case, since)
 
-    def get_bot_status(self):
+    @supervised
+    @hot_path('get_bot_status')
+    def get_bot_status(self, snapshot=None):
+        if snapshot is None:
+            snapshot = self.lookup_snapshot()
         status = {}
         for bot_folder in self.BOT_FOLDERS:
-            running = self.is_bot_running(bot_folder)
+            running = self.is_bot_running(bot_folder, snapshot)
             pid = self.bot_processes.get(bot_folder, None) if running else None
             mem = "-"
             cpu = "-"
             if running and pid:
-                try:
-                    proc = psutil.Process(pid)
-                    mem = f"{proc.memory_info().rss // (1024*1024)} MB"
-                    cpu = f"{proc.cpu_percent(interval=0.1):.1f}%"
-                except Exception:
-                    pass
+                sample = self.metrics_sampler.get(bot_folder, pid)
+                if sample:
+                    mem = f"{sample['rss'] // (1024*1024)} MB"
+                    cpu = f"{sample['cpu']:.1f}%"
             status[bot_folder] = {
+                'next_restart': self.scheduler.due(f"restart:{bot_folder}"),
                 'running': running,
                 'pid': pid,
                 'selected': bot_folder in self.config["all_bots"],
@@ -337,6 +3633,7 @@ class BotManager:
 
 
     def create_tray_icon(self):
+        load_tray_modules()
         # Create system tray icon
         img = Image.new('RGB', (64, 64), color='white')
         d = ImageDraw.Draw(img)
@@ -358,8 +3655,14 @@ class BotManager:
     def on_closing(self):
         """Handle window closing properly"""
         try:
-            # Kill all running bots
-            self.kill_all_bots()
+            self.metrics_sampler.stop()
+            # Kill all running bots, unless they should outlive the manager
+            if self.config.get("detach_on_exit", False):
+                self.detach_bots()
+            else:
+                self.kill_all_bots()
+            if self.archive is not None:
+                self.archive.close()
             
             # Stop system tray
             if self.system_tray:
@@ -385,13 +3688,15 @@ class BotManager:
             self.main_window.after(1000, self.update_timer)
 
     def create_main_window(self):
+        load_tk_modules()
         self.main_window = tk.Tk()
         self.main_window.title("Bot Manager")
         self.main_window.geometry("900x600")
         self.main_window.configure(bg='#2b2b2b')
+        self.ui_pump = TextPump(self.main_window, stats=self.hot_paths)
+        self.ui_pump.start()
 
         try:
-            import sys
             if getattr(sys, 'frozen', False):
                 # Executando como .exe
                 icon_path = os.path.join(sys._MEIPASS, "emblem_2855.ico")
@@ -430,6 +3735,8 @@ class BotManager:
         self.create_setup_tab()
         self.create_control_tab()
         self.create_terminals_tab()
+        self.create_search_tab()
+        self.create_diagnostics_tab()
 
         # Configure resizing
         self.main_window.columnconfigure(0, weight=1)
@@ -443,18 +3750,60 @@ class BotManager:
         self.update_timer()
 
     def update_terminal_bots(self):
-        running_bots = [b for b, mode in getattr(self, 'bot_console_mode', {}).items() if mode == 'NO_WINDOW' and self.is_bot_running(b)]
+        bots = self.supervisor.snapshot.bots
+        running_bots = [b for b, info in bots.items() if info['running'] and info['console'] == 'NO_WINDOW']
         for idx, var in enumerate(self.terminal_selectors):
             current = var.get()
             combo = self.terminal_combos[idx]
             combo['values'] = running_bots
-            if current in running_bots:
-                var.set(current)
-            else:
+            if current and current not in running_bots:
                 var.set('')
 
     def update_terminal_output(self, idx):
-        pass
+        bot_name = self.terminal_selectors[idx].get()
+        if not bot_name:
+            self.terminal_hit_vars[idx].set("")
+            return
+        stats = self.terminal_filters[idx].hit_stats(bot_name)
+        self.terminal_hit_vars[idx].set("   ".join(f"{pattern}: {total} ({rate}/min)" for pattern, total, rate in stats))
+
+    def follow_terminal(self, idx, force=False):
+        """Point terminal idx's tail at its selected bot, with its current filter"""
+        bot_name = self.terminal_selectors[idx].get()
+        followed_bot, token = self.terminal_tails[idx]
+        if bot_name == followed_bot and not force:
+            return
+        self.stop_log_tail(token)
+        token = None
+        if bot_name:
+            token = self.start_log_tail(bot_name, self.terminal_texts[idx], self.terminal_filters[idx])
+        self.terminal_tails[idx] = (bot_name or None, token)
+
+    def terminal_filter(self, idx):
+        filters = self.config.get("terminal_filters") or []
+        spec = filters[idx] if idx < len(filters) and filters[idx] else self.config.get("log_filter")
+        try:
+            return FilterSet.from_config(spec)
+        except re.error as e:
+            self.logger.error(f"Invalid filter for terminal {idx + 1}: {e}")
+            return FilterSet()
+
+    def apply_terminal_filter(self, idx):
+        include, exclude = self.terminal_filter_vars[idx]
+        try:
+            filter_set = FilterSet(split_patterns(include.get()), split_patterns(exclude.get()))
+        except re.error as e:
+            messagebox.showerror("Error", f"Invalid filter pattern: {e}")
+            return
+        self.terminal_filters[idx] = filter_set
+        filters = list(self.config.get("terminal_filters") or [])
+        while len(filters) <= idx:
+            filters.append(None)
+        filters[idx] = filter_set.to_config()
+        self.config["terminal_filters"] = filters
+        self.save_config()
+        self.follow_terminal(idx, force=True)
+        self.update_terminal_output(idx)
 
     def update_all_terminal_outputs(self):
         for i in range(3):
@@ -463,6 +3812,201 @@ class BotManager:
         if self.main_window and self.main_window.winfo_exists():
             self.main_window.after(1000, self.update_all_terminal_outputs)
 
+    def create_search_tab(self):
+        search_frame = ttk.Frame(self.notebook, padding="10")
+        self.notebook.add(search_frame, text="🔎 Search")
+
+        query_frame = ttk.Frame(search_frame)
+        query_frame.grid(row=0, column=0, sticky=tk.W+tk.E, pady=(0, 10))
+        self.search_var = tk.StringVar()
+        search_entry = ttk.Entry(query_frame, textvariable=self.search_var, width=50)
+        search_entry.grid(row=0, column=0, padx=5)
+        search_entry.bind('<Return>', lambda e: self.run_log_search())
+        self.search_regex_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(query_frame, text="Regex", variable=self.search_regex_var).grid(row=0, column=1, padx=5)
+        self.search_case_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(query_frame, text="Match case", variable=self.search_case_var).grid(row=0, column=2, padx=5)
+        ttk.Button(query_frame, text="Search", command=self.run_log_search).grid(row=0, column=3, padx=5)
+        ttk.Button(query_frame, text="More", command=self.more_search_results).grid(row=0, column=4, padx=5)
+        self.search_status_var = tk.StringVar(value="")
+        ttk.Label(query_frame, textvariable=self.search_status_var).grid(row=0, column=5, padx=10)
+
+        results_frame = ttk.Frame(search_frame)
+        results_frame.grid(row=1, column=0, sticky=tk.W+tk.E+tk.N+tk.S)
+        self.search_tree = ttk.Treeview(results_frame, columns=('Bot', 'Line', 'Text'), show='headings')
+        self.search_tree.heading('Bot', text='Bot')
+        self.search_tree.heading('Line', text='Line')
+        self.search_tree.heading('Text', text='Text')
+        self.search_tree.column('Bot', width=100, stretch=False)
+        self.search_tree.column('Line', width=70, stretch=False)
+        self.search_tree.column('Text', width=650)
+        search_scrollbar = ttk.Scrollbar(results_frame, orient=tk.VERTICAL, command=self.search_tree.yview)
+        self.search_tree.configure(yscrollcommand=search_scrollbar.set)
+        self.search_tree.grid(row=0, column=0, sticky=tk.NSEW)
+        search_scrollbar.grid(row=0, column=1, sticky=tk.NS)
+
+        results_frame.columnconfigure(0, weight=1)
+        results_frame.rowconfigure(0, weight=1)
+        search_frame.columnconfigure(0, weight=1)
+        search_frame.rowconfigure(1, weight=1)
+
+        self.search_job = None
+        self.search_shown = 0
+        self.search_page_limit = 0
+
+    def create_diagnostics_tab(self):
+        diag_frame = ttk.Frame(self.notebook, padding="10")
+        self.notebook.add(diag_frame, text="🩺 Diagnostics")
+        self.diag_frame = diag_frame
+
+        button_frame = ttk.Frame(diag_frame)
+        button_frame.grid(row=0, column=0, sticky=tk.W+tk.E, pady=(0, 10))
+        seconds = self.config.get("profile_seconds", 10)
+        ttk.Button(button_frame, text=f"Profile {seconds}s", command=self.run_profile).grid(row=0, column=0, padx=5)
+        ttk.Button(button_frame, text="Dump tracemalloc", command=self.run_tracemalloc_dump).grid(row=0, column=1, padx=5)
+        ttk.Button(button_frame, text="Reset Timers", command=self.hot_paths.reset).grid(row=0, column=2, padx=5)
+        self.diag_status_var = tk.StringVar(value="")
+        ttk.Label(button_frame, textvariable=self.diag_status_var).grid(row=0, column=3, padx=10)
+
+        paths_frame = ttk.LabelFrame(diag_frame, text="Hot Paths (latest 1024 calls)", padding="5")
+        paths_frame.grid(row=1, column=0, sticky=tk.W+tk.E+tk.N+tk.S)
+        path_columns = ('Path', 'Calls', 'p50', 'p99', 'Max', 'Total')
+        self.diag_paths_tree = ttk.Treeview(paths_frame, columns=path_columns, show='headings', height=10)
+        for column, text, width in zip(path_columns, ('Path', 'Calls', 'p50 (ms)', 'p99 (ms)', 'Max (ms)', 'Total (s)'),
+                                       (200, 90, 90, 90, 90, 90)):
+            self.diag_paths_tree.heading(column, text=text)
+            self.diag_paths_tree.column(column, width=width, stretch=column == 'Path')
+        self.diag_paths_tree.grid(row=0, column=0, sticky=tk.NSEW)
+        paths_frame.columnconfigure(0, weight=1)
+        paths_frame.rowconfigure(0, weight=1)
+
+        threads_frame = ttk.LabelFrame(diag_frame, text="Threads", padding="5")
+        threads_frame.grid(row=2, column=0, sticky=tk.W+tk.E, pady=(10, 0))
+        self.diag_threads_tree = ttk.Treeview(threads_frame, columns=('Subsystem', 'Threads', 'CPU'), show='headings', height=6)
+        self.diag_threads_tree.heading('Subsystem', text='Subsystem')
+        self.diag_threads_tree.heading('Threads', text='Threads')
+        self.diag_threads_tree.heading('CPU', text='CPU %')
+        self.diag_threads_tree.column('Threads', width=90, stretch=False)
+        self.diag_threads_tree.column('CPU', width=90, stretch=False)
+        self.diag_threads_tree.grid(row=0, column=0, sticky=tk.NSEW)
+        threads_frame.columnconfigure(0, weight=1)
+        self.diag_process_var = tk.StringVar(value="")
+        ttk.Label(diag_frame, textvariable=self.diag_process_var).grid(row=3, column=0, sticky=tk.W, pady=(5, 0))
+
+        diag_frame.columnconfigure(0, weight=1)
+        diag_frame.rowconfigure(1, weight=1)
+        self.update_diagnostics()
+
+    def diagnostics_report(self, caller='api'):
+        """Hot path timings, counters and per-subsystem threads/CPU as one dict;
+        CPU is measured since caller's previous report"""
+        cpu, subsystems = self.diagnostics.usage(caller)
+        rss = self.diagnostics.process.memory_info().rss
+        return {
+            'ts': time.time(),
+            'paths': self.hot_paths.summary(),
+            'counters': dict(self.hot_paths.counters),
+            'subsystems': [{'name': name, 'threads': threads, 'cpu_percent': percent}
+                           for name, threads, percent in subsystems],
+            'process': {'cpu_percent': cpu, 'rss': rss, 'threads': threading.active_count()}
+        }
+
+    def update_diagnostics(self):
+        if not self.main_window or not self.main_window.winfo_exists():
+            return
+        # Only pay for the thread walk while the tab is on screen
+        if self.notebook.select() == str(self.diag_frame):
+            report = self.diagnostics_report('ui')
+            self.diag_paths_tree.delete(*self.diag_paths_tree.get_children())
+            for name, stats in report['paths'].items():
+                self.diag_paths_tree.insert('', 'end', values=(name, stats['count'], stats['p50_ms'], stats['p99_ms'],
+                                                               stats['max_ms'], stats['total_s']))
+            self.diag_threads_tree.delete(*self.diag_threads_tree.get_children())
+            for row in report['subsystems']:
+                self.diag_threads_tree.insert('', 'end', values=(row['name'], row['threads'], row['cpu_percent']))
+            process = report['process']
+            captured = report['counters'].get('captured_lines', 0)
+            self.diag_process_var.set(f"Manager: CPU {process['cpu_percent']:.1f}% | "
+                                      f"RSS {process['rss'] // (1024*1024)} MB | "
+                                      f"{process['threads']} Python threads | {captured} lines captured")
+        self.main_window.after(2000, self.update_diagnostics)
+
+    def run_profile(self):
+        seconds = self.config.get("profile_seconds", 10)
+
+        def done(path, top):
+            # Called on the profiler thread: hand the result to the Tk thread
+            message = f"Profile written to {path}" if path else "Profiling failed, see the log"
+            if top:
+                message += " | hottest: " + ", ".join(f"{name} ×{count}" for name, count in top[:3])
+            self.diag_result = message
+
+        self.diag_result = None
+        if not self.diagnostics.profile(seconds, on_done=done):
+            self.diag_status_var.set("A profile is already running")
+            return
+        self.diag_status_var.set(f"Profiling for {seconds}s...")
+        self.poll_profile()
+
+    def poll_profile(self):
+        if not self.main_window or not self.main_window.winfo_exists():
+            return
+        if self.diag_result is None:
+            self.main_window.after(250, self.poll_profile)
+            return
+        self.diag_status_var.set(self.diag_result)
+
+    def run_tracemalloc_dump(self):
+        try:
+            path = self.diagnostics.dump_tracemalloc()
+        except Exception as e:
+            self.logger.error(f"Error dumping tracemalloc snapshot: {e}")
+            self.diag_status_var.set(f"tracemalloc dump failed: {e}")
+            return
+        if path is None:
+            self.diag_status_var.set("tracemalloc started; click again later to write a snapshot and stop it")
+        else:
+            self.diag_status_var.set(f"tracemalloc snapshot written to {path}; tracing stopped")
+
+    def run_log_search(self):
+        pattern = self.search_var.get()
+        if not pattern:
+            return
+        if self.search_job is not None:
+            self.search_job.cancel_event.set()
+        try:
+            job = self.search_logs(pattern, regex=self.search_regex_var.get(),
+                                   ignore_case=not self.search_case_var.get())
+        except re.error as e:
+            messagebox.showerror("Error", f"Invalid regex: {e}")
+            return
+        self.search_tree.delete(*self.search_tree.get_children())
+        self.search_job = job
+        self.search_shown = 0
+        self.search_page_limit = 200
+        self.poll_search_results(job)
+
+    def more_search_results(self):
+        if self.search_job is not None:
+            self.search_page_limit += 200
+            self.poll_search_results(self.search_job, reschedule=False)
+
+    def poll_search_results(self, job, reschedule=True):
+        """Show results page by page while the search is still running"""
+        if job is not self.search_job or not self.main_window or not self.main_window.winfo_exists():
+            return
+        page = job.page(self.search_shown, self.search_page_limit - self.search_shown)
+        for result in page['results']:
+            self.search_tree.insert('', 'end', values=(result['bot'], result['line'], result['text']))
+        self.search_shown += len(page['results'])
+        state = "done" if page['done'] else f"searching {page['files'][0]}/{page['files'][1]} files"
+        more = " (limit reached)" if page['truncated'] else ""
+        self.search_status_var.set(f"{page['total']} matches, showing {self.search_shown} - {state}{more}")
+        if reschedule and not page['done']:
+            self.main_window.after(200, lambda: self.poll_search_results(job))
+        elif reschedule and self.search_shown < min(page['total'], self.search_page_limit):
+            self.poll_search_results(job, reschedule=False)
+
     def create_terminals_tab(self):
         terminals_frame = ttk.Frame(self.notebook, padding="10")
         self.notebook.add(terminals_frame, text="🖥️ Terminais")
@@ -470,6 +4014,10 @@ class BotManager:
         self.terminal_selectors = []
         self.terminal_texts = []
         self.terminal_combos = []
+        self.terminal_tails = [(None, None)] * 3  # (bot, tail token) per terminal
+        self.terminal_filters = [self.terminal_filter(i) for i in range(3)]
+        self.terminal_filter_vars = []  # (include, exclude) StringVars per terminal
+        self.terminal_hit_vars = []
 
         for i in range(3):
             frame = ttk.LabelFrame(terminals_frame, text=f"Terminal {i+1}", padding="5")
@@ -483,19 +4031,33 @@ class BotManager:
             reset_btn = ttk.Button(frame, text="⟳", width=2, command=lambda idx=i: self.reset_bot_log(self.terminal_selectors[idx].get(), self.terminal_texts[idx]))
             reset_btn.place(relx=1.0, rely=0.0, anchor='ne', x=-5, y=5)
 
+            # Filtros: padrões separados por ';'
+            filter_frame = ttk.Frame(frame)
+            filter_frame.pack(fill=tk.X, pady=2)
+            include_var = tk.StringVar(value="; ".join(self.terminal_filters[i].include))
+            exclude_var = tk.StringVar(value="; ".join(self.terminal_filters[i].exclude))
+            self.terminal_filter_vars.append((include_var, exclude_var))
+            ttk.Label(filter_frame, text="Include:").pack(side=tk.LEFT)
+            include_entry = ttk.Entry(filter_frame, textvariable=include_var, width=35)
+            include_entry.pack(side=tk.LEFT, padx=5)
+            ttk.Label(filter_frame, text="Exclude:").pack(side=tk.LEFT)
+            exclude_entry = ttk.Entry(filter_frame, textvariable=exclude_var, width=25)
+            exclude_entry.pack(side=tk.LEFT, padx=5)
+            for entry in (include_entry, exclude_entry):
+                entry.bind('<Return>', lambda e, idx=i: self.apply_terminal_filter(idx))
+            ttk.Button(filter_frame, text="Apply", command=lambda idx=i: self.apply_terminal_filter(idx)).pack(side=tk.LEFT, padx=5)
+            hit_var = tk.StringVar(value="")
+            self.terminal_hit_vars.append(hit_var)
+            ttk.Label(filter_frame, textvariable=hit_var).pack(side=tk.LEFT, padx=10)
+
             text = tk.Text(frame, height=8, width=120, bg='#1e1e1e', fg='#00ff00', font=('Consolas', 9))
+            text.tag_configure(TextPump.HIGHLIGHT_TAG, foreground='#1e1e1e', background='#ffd700')
             text.pack(fill=tk.BOTH, expand=True)
             self.terminal_texts.append(text)
+            self.ui_pump.register(text, self.config.get("terminal_max_lines", 1000))
 
             # Conecte o callback ao evento de mudança do combobox
-            def make_update_func(idx):
-                def update_output(*args):
-                    bot_name = self.terminal_selectors[idx].get()
-                    text_widget = self.terminal_texts[idx]
-                    if bot_name:
-                        self.start_log_tail(bot_name, text_widget)
-                return update_output
-            bot_var.trace_add('write', make_update_func(i))
+            bot_var.trace_add('write', lambda *args, idx=i: self.follow_terminal(idx))
 
         terminals_frame.columnconfigure(0, weight=1)
         for i in range(3):
@@ -527,6 +4089,12 @@ class BotManager:
         
         ttk.Button(dir_frame, text="Save", 
                   command=self.save_base_directory).grid(row=0, column=4, padx=5)
+
+        self.folder_watch_var = tk.BooleanVar(value=self.config.get("folder_watch", False))
+        ttk.Checkbutton(dir_frame, text="Watch", variable=self.folder_watch_var,
+                        command=self.toggle_folder_watch).grid(row=0, column=5, padx=5)
+        self.folder_scan_var = tk.StringVar(value="")
+        ttk.Label(dir_frame, textvariable=self.folder_scan_var).grid(row=0, column=6, padx=5)
         
         # Bot folders section
         bots_frame = ttk.LabelFrame(setup_frame, text="Bot Folders", padding="10")
@@ -562,6 +4130,7 @@ class BotManager:
         
         # Load existing folders
         self.refresh_bot_folder_list()
+        self.apply_folder_changes()
         
         # Configure resizing
         setup_frame.columnconfigure(0, weight=1)
@@ -594,18 +4163,26 @@ class BotManager:
 
         ttk.Button(ctrl_frame, text="Save Settings", command=self.save_settings).grid(row=0, column=7, padx=5)
 
+        self.watchdog_var = tk.BooleanVar(value=self.config.get("watchdog_enabled", False))
+        ttk.Checkbutton(ctrl_frame, text="Watchdog", variable=self.watchdog_var).grid(row=0, column=9, padx=5)
+
         tree_frame = ttk.LabelFrame(control_frame, text="Bot Status", padding="10")
         tree_frame.grid(row=1, column=0, sticky=tk.W+tk.E+tk.N+tk.S, columnspan=2)
 
-        columns = ('Bot', 'Status', 'PID', 'Console', 'Memory', 'CPU', 'Uptime')
+        columns = ('Bot', 'Status', 'PID', 'Console', 'Memory', 'CPU', 'CPUTrend', 'MemTrend', 'Uptime', 'NextRestart')
         self.bot_tree = ttk.Treeview(tree_frame, columns=columns, show='headings', height=10)
+        self.tree_rows = {}
+        self.tree_version = None
         self.bot_tree.heading('Bot', text='Bot Name')
         self.bot_tree.heading('Status', text='Status')
         self.bot_tree.heading('PID', text='Process ID')
         self.bot_tree.heading('Console', text='Console')
         self.bot_tree.heading('Memory', text='Memory')
         self.bot_tree.heading('CPU', text='CPU')
+        self.bot_tree.heading('CPUTrend', text='CPU (1 min)')
+        self.bot_tree.heading('MemTrend', text='Memory (20 min)')
         self.bot_tree.heading('Uptime', text='Uptime')
+        self.bot_tree.heading('NextRestart', text='Next Restart')
 
         self.bot_tree.column('Bot', width=120)
         self.bot_tree.column('Status', width=100)
@@ -613,7 +4190,10 @@ class BotManager:
         self.bot_tree.column('Console', width=80)
         self.bot_tree.column('Memory', width=70)
         self.bot_tree.column('CPU', width=60)
+        self.bot_tree.column('CPUTrend', width=130)
+        self.bot_tree.column('MemTrend', width=130)
         self.bot_tree.column('Uptime', width=90)
+        self.bot_tree.column('NextRestart', width=110)
 
         scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.bot_tree.yview)
         self.bot_tree.configure(yscrollcommand=scrollbar.set)
@@ -626,8 +4206,13 @@ class BotManager:
         ttk.Button(action_frame, text="Stop", command=self.stop_selected_bot).pack(side=tk.LEFT, padx=5)
         ttk.Button(action_frame, text="Restart", command=self.restart_selected_bot).pack(side=tk.LEFT, padx=5)
         ttk.Button(action_frame, text="View Output", command=self.view_bot_output).pack(side=tk.LEFT, padx=5)
+        ttk.Button(action_frame, text="Export History", command=self.export_history).pack(side=tk.LEFT, padx=5)
         ttk.Button(action_frame, text="Select All", command=self.select_all_bots).pack(side=tk.LEFT, padx=5)
         ttk.Button(action_frame, text="Deselect All", command=self.deselect_all_bots).pack(side=tk.LEFT, padx=5)
+        self.bulk_progress_var = tk.StringVar(value="")
+        ttk.Label(action_frame, textvariable=self.bulk_progress_var).pack(side=tk.LEFT, padx=(15, 5))
+        self.bulk_cancel_btn = ttk.Button(action_frame, text="Cancel", command=self.cancel_bulk_job, state=tk.DISABLED)
+        self.bulk_cancel_btn.pack(side=tk.LEFT, padx=5)
 
         log_frame = ttk.LabelFrame(control_frame, text="System Logs", padding="10")
         log_frame.grid(row=3, column=0, sticky=tk.W+tk.E+tk.N+tk.S, pady=(10, 0), columnspan=2)
@@ -674,7 +4259,7 @@ class BotManager:
             idx_target = self.bot_tree.index(target)
             self.bot_tree.move(self._dragging_item, '', idx_target)
             # Atualize a ordem na lista BOT_FOLDERS também!
-            bot_names = [self.bot_tree.item(i)['values'][0] for i in self.bot_tree.get_children()]
+            bot_names = list(self.bot_tree.get_children())
             self.BOT_FOLDERS = bot_names
 
     def on_treeview_drag_release(self, event):
@@ -689,32 +4274,109 @@ class BotManager:
             self.BASE_DIR = directory
 
     def scan_bot_folders(self):
-        """Scan base directory and add found folders to list"""
+        """Scan base directory in the background and add found folders to list"""
         base_dir = self.base_dir_var.get()
-        if not os.path.exists(base_dir):
+        if not os.path.isdir(base_dir):
             messagebox.showerror("Error", "Directory does not exist!")
             return
 
         self.BASE_DIR = base_dir
-        
+        self.folder_scan_var.set("Scanning...")
+
+        def scan():
+            try:
+                self.folder_scan_result = (base_dir, self.folder_scanner.scan(base_dir), None)
+            except Exception as e:
+                self.folder_scan_result = (base_dir, None, e)
+
+        threading.Thread(target=scan, name="folder-scan", daemon=True).start()
+        self.main_window.after(100, self.finish_folder_scan)
+
+    def finish_folder_scan(self):
+        if not self.main_window or not self.main_window.winfo_exists():
+            return
+        if self.folder_scan_result is None:
+            self.main_window.after(100, self.finish_folder_scan)
+            return
+        base_dir, found, error = self.folder_scan_result
+        self.folder_scan_result = None
+        self.folder_scan_var.set("")
+        if error is not None:
+            messagebox.showerror("Error", f"Scan failed: {str(error)}")
+            return
+        self.merge_bot_folders(found)
+        # Refresh UI
+        self.refresh_bot_folder_list()
+        messagebox.showinfo("Scan Complete", f"Found {len(self.BOT_FOLDERS)} bot folders")
+
+    def merge_bot_folders(self, found):
+        """Keep the configured order, append new folders and drop the ones an earlier scan
+        found that are gone now; saves the config on change and returns (added, removed).
+
+        Folders added by hand that no scan reports (no start.exe yet, nested
+        paths) are kept.
+        """
+        found_set = set(found)
+        current = list(self.BOT_FOLDERS)
+        removed = [folder for folder in current if folder in self.scanned_bot_folders and folder not in found_set]
+        kept = [folder for folder in current if folder not in removed]
+        known = set(kept)
+        added = [folder for folder in found if folder not in known]
+        self.scanned_bot_folders = found_set
+        self.BOT_FOLDERS = kept + added
+        if added or removed:
+            self.save_config()
+        return added, removed
+
+    def watch_bot_folders(self):
+        """Scheduler callback: rescan the base directory while folder_watch is on"""
+        if not self.config.get("folder_watch", False):
+            return
         try:
-            # Clear current list
-            self.BOT_FOLDERS = []
-            
-            # Find valid bot folders
-            for folder in os.listdir(base_dir):
-                folder_path = os.path.join(base_dir, folder)
-                if os.path.isdir(folder_path):
-                    exe_path = os.path.join(folder_path, f"start.exe")
-                    if os.path.exists(exe_path):
-                        self.BOT_FOLDERS.append(folder)
-            
-            # Refresh UI
-            self.refresh_bot_folder_list()
-            messagebox.showinfo("Scan Complete", f"Found {len(self.BOT_FOLDERS)} bot folders")
-            
+            if self.BASE_DIR and os.path.isdir(self.BASE_DIR):
+                found = self.folder_scanner.scan(self.BASE_DIR)
+                if set(found) != self.scanned_bot_folders:
+                    if self.main_window is None:
+                        added, removed = self.merge_bot_folders(found)
+                        self.logger.info(f"Bot folders changed: +{added} -{removed}")
+                    else:
+                        # Applied by the UI once changes settle down
+                        if found != self.folder_watch_found:
+                            self.folder_watch_found = found
+                            self.folder_changes_at = time.time()
         except Exception as e:
-            messagebox.showerror("Error", f"Scan failed: {str(e)}")
+            self.logger.error(f"Error watching bot folders: {e}")
+        self.scheduler.schedule("folder-watch", self.config.get("folder_watch_interval", 5),
+                                self.watch_bot_folders, label="folder watch")
+
+    def toggle_folder_watch(self):
+        self.config["folder_watch"] = self.folder_watch_var.get()
+        self.save_config()
+        if self.config["folder_watch"]:
+            self.scheduler.schedule("folder-watch", 0, self.watch_bot_folders, label="folder watch")
+        else:
+            self.scheduler.cancel("folder-watch")
+
+    def apply_folder_changes(self, debounce=1.0):
+        """Tk loop: fold watched folder changes into the lists once they stop arriving"""
+        if not self.main_window or not self.main_window.winfo_exists():
+            return
+        found = self.folder_watch_found
+        if found is not None and time.time() - self.folder_changes_at >= debounce:
+            self.folder_watch_found = None
+            added, removed = self.merge_bot_folders(found)
+            if added or removed:
+                self.logger.info(f"Bot folders changed: +{added} -{removed}")
+                for folder in removed:
+                    entry = self.bot_folder_entries.pop(folder, None)
+                    if entry:
+                        entry['frame'].destroy()
+                row = self.next_folder_row()
+                for offset, folder in enumerate(added):
+                    self.add_bot_folder_row(row + offset, folder)
+                self.enable_drag_and_drop()
+                self.update_bot_status()
+        self.main_window.after(500, self.apply_folder_changes)
 
     def save_base_directory(self):
         """Save the base directory"""
@@ -790,17 +4452,25 @@ class BotManager:
         status_label = ttk.Label(frame, text="", width=15)
         status_label.grid(row=0, column=1, padx=5)
 
-        def update_status(*args):
+        pending_check = [None]
+
+        def update_status():
+            pending_check[0] = None
             folder_name = entry_var.get()
             if folder_name:
-                path = os.path.join(self.BASE_DIR, folder_name)
-                if os.path.exists(path):
+                if self.folder_scanner.folder_exists(self.BASE_DIR, folder_name):
                     status_label.config(text="✅ Exists", foreground="green")
                 else:
                     status_label.config(text="❌ Not Found", foreground="red")
             else:
                 status_label.config(text="", foreground="black")
-        entry_var.trace('w', update_status)
+
+        def schedule_status(*args):
+            # Check once typing pauses, not on every keystroke
+            if pending_check[0] is not None:
+                frame.after_cancel(pending_check[0])
+            pending_check[0] = frame.after(300, update_status)
+        entry_var.trace('w', schedule_status)
         update_status()
 
         action_frame = ttk.Frame(frame)
@@ -840,8 +4510,13 @@ class BotManager:
 
     def add_bot_folder(self):
         """Add a new bot folder entry"""
-        new_row = len(self.scrollable_frame.winfo_children())
-        self.add_bot_folder_row(new_row, "")
+        self.add_bot_folder_row(self.next_folder_row(), "")
+
+    def next_folder_row(self):
+        """First grid row below every folder row; deleted rows leave gaps, so not the child count"""
+        rows = [int(widget.grid_info().get("row", 0)) for widget in self.scrollable_frame.winfo_children()
+                if widget.winfo_manager() == "grid"]
+        return max(rows) + 1 if rows else 0
 
     def save_bot_configuration(self):
         """Save bot folder configuration"""
@@ -880,8 +4555,7 @@ class BotManager:
         """Handle treeview selection"""
         self.tree_selection = []
         for item in self.bot_tree.selection():
-            bot_name = self.bot_tree.item(item)['values'][0]
-            self.tree_selection.append(bot_name)
+            self.tree_selection.append(item)
             
         # Update button states
         self.update_action_buttons()
@@ -906,7 +4580,8 @@ class BotManager:
             
         # Check status of first selected bot
         bot_name = self.tree_selection[0]
-        is_running = self.is_bot_running(bot_name)
+        info = self.supervisor.snapshot.bots.get(bot_name)
+        is_running = bool(info and info['running'])
         
         # Enable/disable buttons appropriately
         # (In a real implementation, you might want to handle multiple states)
@@ -914,8 +4589,7 @@ class BotManager:
     def select_all_bots(self):
         """Select all bots in treeview"""
         self.bot_tree.selection_set(self.bot_tree.get_children())
-        self.tree_selection = [self.bot_tree.item(item)['values'][0] 
-                              for item in self.bot_tree.get_children()]
+        self.tree_selection = list(self.bot_tree.get_children())
         self.update_action_buttons()
 
     def deselect_all_bots(self):
@@ -924,28 +4598,73 @@ class BotManager:
         self.tree_selection = []
         self.update_action_buttons()
 
+    def launch_visible(self):
+        return self.visible_bots_var.get() if hasattr(self, 'visible_bots_var') else False
+
+    def run_bulk(self, op, bots, report=False):
+        """Hand a bulk operation to the orchestrator and follow it from the UI"""
+        options = {'visible': self.launch_visible()} if op == 'start' else {}
+        job = self.submit_job(op, bots, **options)
+        self.active_bulk_job = job
+        if self.main_window and self.main_window.winfo_exists():
+            self.bulk_cancel_btn.config(state=tk.NORMAL)
+            self.track_bulk_job(job, report)
+        return job
+
+    def track_bulk_job(self, job, report):
+        if job is not self.active_bulk_job or not self.main_window or not self.main_window.winfo_exists():
+            return
+        done, ok, total = job.progress()
+        if job.finished is None:
+            self.bulk_progress_var.set(f"{job.op.capitalize()}: {done}/{total} ({done - ok} failed)")
+            self.main_window.after(250, lambda: self.track_bulk_job(job, report))
+            return
+
+        self.bulk_progress_var.set(f"{job.op.capitalize()} {job.state}: {ok}/{total} succeeded")
+        self.bulk_cancel_btn.config(state=tk.DISABLED)
+        self.active_bulk_job = None
+        self.update_bot_status()
+        if report:
+            verb = {'start': 'started', 'stop': 'stopped', 'restart': 'restarted'}[job.op]
+            messagebox.showinfo("Result", f"{ok} out of {total} bots {verb}!")
+
+    def cancel_bulk_job(self):
+        if self.active_bulk_job is not None:
+            self.active_bulk_job.cancel()
+
     def start_selected_bot(self):
         if not self.tree_selection:
             return
-        for bot_name in self.tree_selection:
-            self.start_bot(bot_name, visible=self.visible_bots_var.get())
-        self.update_bot_status()
+        self.run_bulk('start', list(self.tree_selection))
 
     def stop_selected_bot(self):
         if not self.tree_selection:
             return
-            
-        for bot_name in self.tree_selection:
-            self.kill_bot(bot_name)
-        self.update_bot_status()
+        self.run_bulk('stop', list(self.tree_selection))
 
     def restart_selected_bot(self):
         if not self.tree_selection:
             return
-            
-        for bot_name in self.tree_selection:
-            self.restart_bot(bot_name)
-        self.update_bot_status()
+        self.run_bulk('restart', list(self.tree_selection))
+
+    def export_history(self):
+        """Export the resource history of the selected bots (or all) to CSV"""
+        bots = self.tree_selection or list(self.BOT_FOLDERS)
+        minutes = simpledialog.askinteger("Export History", "Export the last how many minutes?",
+                                          initialvalue=60, minvalue=1, parent=self.main_window)
+        if not minutes:
+            return
+        path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV", "*.csv")],
+                                            initialfile="bot_history.csv", parent=self.main_window)
+        if not path:
+            return
+        try:
+            written = self.metrics_history.export_csv(path, bots, start=time.time() - minutes * 60)
+            self.logger.info(f"Exported {written} history rows to {path}")
+            messagebox.showinfo("Export History", f"{written} rows written to {path}")
+        except Exception as e:
+            self.logger.error(f"Error exporting history: {e}")
+            messagebox.showerror("Error", f"Error exporting history: {e}")
 
     def view_bot_output(self):
         """Show bot output for the first selected bot"""
@@ -972,61 +4691,60 @@ class BotManager:
         output_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         output_text.configure(yscrollcommand=output_scrollbar.set)
         
-        # Load existing output
-        if bot_name in self.bot_outputs:
-            for line in self.bot_outputs[bot_name]:
-                output_text.insert(tk.END, line + '\n')
-        
-        output_text.see(tk.END)
-        
+        dropped_var = tk.StringVar(value="")
+        ttk.Label(frame, textvariable=dropped_var).pack(anchor=tk.W, pady=(5, 0))
+
+        # This window's own cursor: starts at the oldest buffered line
+        ring = self.get_output_ring(bot_name)
+        cursor = ring.cursor()
+        self.ui_pump.register(output_text, self.config.get("output_max_lines", 2000))
+        pending_update = [None]
+
+        def on_destroy(event):
+            # <Destroy> on a Toplevel also fires for each of its children
+            if event.widget is not output_window:
+                return
+            self.ui_pump.unregister(output_text)
+            if pending_update[0] is not None:
+                output_window.after_cancel(pending_update[0])
+                pending_update[0] = None
+        output_window.bind("<Destroy>", on_destroy)
+
         # Real-time update function
         def update_output():
-            if bot_name in self.output_queues:
-                try:
-                    while True:
-                        line = self.output_queues[bot_name].get_nowait()
-                        output_text.insert(tk.END, line + '\n')
-                        output_text.see(tk.END)
-                except queue.Empty:
-                    pass
+            pending_update[0] = None
+            lines = cursor.read()
+            if lines:
+                self.ui_pump.push(output_text, lines)
+            dropped_var.set(f"Buffered: {len(ring)} lines | Dropped here: {cursor.dropped} | "
+                            f"Evicted total: {ring.evicted}")
             
             if output_window.winfo_exists():
-                output_window.after(1000, update_output)
+                pending_update[0] = output_window.after(250, update_output)
         
         # Start real-time updates
         update_output()
 
     def start_all_bots(self):
         if not self.BOT_FOLDERS:
-            messagebox.showwarning("Warning", "No bots found!")
+            if self.main_window:
+                messagebox.showwarning("Warning", "No bots found!")
             return
-        started = 0
-        for bot_name in self.BOT_FOLDERS:
-            if self.start_bot(bot_name, visible=self.visible_bots_var.get()):
-                started += 1
-        self.update_bot_status()
+        self.run_bulk('start', list(self.BOT_FOLDERS))
 
     def stop_all_bots(self):
         if not self.BOT_FOLDERS:
-            messagebox.showwarning("Warning", "No bots found!")
+            if self.main_window:
+                messagebox.showwarning("Warning", "No bots found!")
             return
-        killed = 0
-        for bot_name in self.BOT_FOLDERS:
-            if self.kill_bot(bot_name):
-                killed += 1
-        messagebox.showinfo("Result", f"{killed} out of {len(self.BOT_FOLDERS)} bots stopped!")
-        self.update_bot_status()
+        self.run_bulk('stop', list(self.BOT_FOLDERS), report=True)
 
     def restart_all_bots_ui(self):
         if not self.BOT_FOLDERS:
-            messagebox.showwarning("Warning", "No bots found!")
+            if self.main_window:
+                messagebox.showwarning("Warning", "No bots found!")
             return
-        restarted = 0
-        for bot_name in self.BOT_FOLDERS:
-            if self.restart_bot(bot_name):
-                restarted += 1
-        messagebox.showinfo("Result", f"{restarted} out of {len(self.BOT_FOLDERS)} bots restarted successfully!")
-        self.update_bot_status()
+        self.run_bulk('restart', list(self.BOT_FOLDERS), report=True)
 
     def save_settings(self):
         try:
@@ -1034,73 +4752,116 @@ class BotManager:
             self.config["restart_interval"] = int(self.restart_interval_var.get()) * 60
             self.config["auto_restart"] = self.auto_restart_var.get()
             self.config["capture_output"] = self.capture_output_var.get()
+            self.config["watchdog_enabled"] = self.watchdog_var.get()
             self.save_config()
             messagebox.showinfo("Success", "Settings saved successfully!")
         except ValueError:
             messagebox.showerror("Error", "Restart interval must be a number!")
 
+    @hot_path('update_bot_status')
     def update_bot_status(self):
         if not hasattr(self, 'bot_tree'):
             return
 
-        selected_items = self.bot_tree.selection()
-        all_bots = [self.bot_tree.item(item)['values'][0] for item in selected_items]
-
-        for bot_folder in list(self.bot_process_objs.keys()):
-            process = self.bot_process_objs.get(bot_folder)
-            if process and process.poll() is not None:
-                # Processo já morreu, remova do dict
-                del self.bot_process_objs[bot_folder]
-                if bot_folder in self.bot_processes:
-                    del self.bot_processes[bot_folder]
-                if hasattr(self, 'bot_console_mode') and bot_folder in self.bot_console_mode:
-                    del self.bot_console_mode[bot_folder]
-                # UPTIME: congela o uptime ao morrer
-                if bot_folder in self.bot_start_times:
-                    self.bot_last_uptimes[bot_folder] = int(time.time() - self.bot_start_times[bot_folder])
-                    del self.bot_start_times[bot_folder]
-
-        for item in self.bot_tree.get_children():
-            self.bot_tree.delete(item)
-
-        status = self.get_bot_status()
-        for bot_name, info in status.items():
-            status_text = "🟢 Running" if info['running'] else "🔴 Stopped"
-            pid_text = str(info['pid']) if info['pid'] else "-"
-            console_mode = getattr(self, 'bot_console_mode', {}).get(bot_name, '-')
-            mem = info.get('mem', '-')
-            cpu = info.get('cpu', '-')
-            # UPTIME: calcula ao vivo se rodando, senão mostra congelado
-            if info['running'] and bot_name in self.bot_start_times:
-                elapsed = int(time.time() - self.bot_start_times[bot_name])
-                uptime = elapsed
-                self.bot_last_uptimes[bot_name] = uptime  # Atualiza o uptime congelado
-            else:
-                uptime = self.bot_last_uptimes.get(bot_name, 0)
+        self.reap_exited_bots()
+        if not self.metrics_sampler.running():
+            self.supervisor.submit('refresh', self.supervisor.publish)
+
+        # Rows come from the supervisor's snapshot, so nothing here touches a
+        # process, and they are only rebuilt when its version moves. Uptime is
+        # the one live column and is recomputed every tick.
+        snapshot = self.supervisor.snapshot
+        if snapshot.version != self.tree_version:
+            self.tree_version = snapshot.version
+            self.tree_status = self.build_tree_status(snapshot)
+        now = time.time()
+        rows = {}
+        for bot_name, (values, started, last_uptime) in self.tree_status.items():
+            uptime = int(now - started) if started else last_uptime
             h = uptime // 3600
             m = (uptime % 3600) // 60
             s = uptime % 60
             uptime_str = f"{h:02d}:{m:02d}:{s:02d}" if uptime > 0 else "-"
-            item = self.bot_tree.insert('', 'end', values=(bot_name, status_text, pid_text, console_mode, mem, cpu, uptime_str))
-            if bot_name in all_bots:
-                self.bot_tree.selection_add(item)
+            rows[bot_name] = values[:8] + (uptime_str,) + values[8:]
 
+        self.apply_tree_rows(rows)
         self.update_action_buttons()
 
+    def build_tree_status(self, snapshot):
+        """Treeview values per bot from a snapshot, minus the live uptime column"""
+        tree_status = {}
+        for bot_name, info in snapshot.bots.items():
+            status_text = "🟢 Running" if info['running'] else "🔴 Stopped"
+            if not info['running'] and info['crash_loop']:
+                status_text = "⛔ Crash loop"
+            elif not info['running'] and info['next_resurrect']:
+                status_text = f"💥 Crashed ({'?' if info['exit_code'] is None else info['exit_code']})"
+            if info['running'] and info['health'] not in (None, 'ok', 'starting'):
+                status_text = "🟠 Unhealthy"
+            pid_text = str(info['pid']) if info['pid'] else "-"
+            console_mode = info['console'] or '-'
+            mem = info.get('mem', '-')
+            cpu = info.get('cpu', '-')
+            # Absolute time rather than a countdown, so the cell only changes on reschedule
+            next_restart = info.get('next_restart')
+            next_restart_str = datetime.fromtimestamp(next_restart).strftime("%d/%m %H:%M") if next_restart else "-"
+            # 1 s tier for CPU spikes, 1 min tier for slow memory growth
+            cpu_trend = sparkline(self.metrics_history.last(bot_name, 'cpu', 60)[2::3], floor=0)
+            mem_trend = sparkline(self.metrics_history.last(bot_name, 'rss', 20, tier=1))
+            # UPTIME: ao vivo se rodando (a partir de started), senão o congelado
+            tree_status[bot_name] = ((bot_name, status_text, pid_text, console_mode, mem, cpu, cpu_trend, mem_trend, next_restart_str),
+                                     info['started'], info['last_uptime'])
+        return tree_status
+
+    def apply_tree_rows(self, rows):
+        """Diff rows against the Treeview and touch only cells that changed.
+
+        Rows are never deleted and reinserted, so selection, focus and
+        scroll position survive every refresh.
+        """
+        columns = self.bot_tree['columns']
+        for bot_name in list(self.tree_rows):
+            if bot_name not in rows:
+                if self.bot_tree.exists(bot_name):
+                    self.bot_tree.delete(bot_name)
+                del self.tree_rows[bot_name]
+
+        for bot_name, values in rows.items():
+            previous = self.tree_rows.get(bot_name)
+            if previous is None:
+                self.bot_tree.insert('', 'end', iid=bot_name, values=values)
+            elif previous != values:
+                for column, old, new in zip(columns, previous, values):
+                    if old != new:
+                        self.bot_tree.set(bot_name, column, new)
+            self.tree_rows[bot_name] = values
+
+        # Only reorder when the configured order actually differs (scan, save, drag)
+        order = list(rows)
+        if list(self.bot_tree.get_children()) != order:
+            for index, bot_name in enumerate(order):
+                self.bot_tree.move(bot_name, '', index)
+
+    @hot_path('update_logs')
     def update_logs(self):
-        if not hasattr(self, 'log_text'):
+        """Append manager log lines written since the last call to the System Logs panel"""
+        if not hasattr(self, 'log_text') or self.ui_pump is None:
             return
-            
+
         try:
-            if os.path.exists(self.log_file):
-                with open(self.log_file, 'r') as f:
-                    lines = f.readlines()
-                    # Show only last 50 lines
-                    recent_lines = lines[-50:] if len(lines) > 50 else lines
-                    
-                    self.log_text.delete(1.0, tk.END)
-                    self.log_text.insert(tk.END, ''.join(recent_lines))
-                    self.log_text.see(tk.END)
+            if self.log_panel is None or self.log_panel[0] is not self.log_text:
+                # New panel: backfill the last lines, then follow from there
+                max_lines = self.config.get("log_panel_lines", 50)
+                followed = FollowedFile(self.log_file)
+                lines = []
+                if followed.ident is not None:
+                    lines, followed.offset = read_last_lines(self.log_file, max_lines, end=followed.offset)
+                self.ui_pump.register(self.log_text, max_lines)
+                self.log_panel = (self.log_text, followed)
+            else:
+                lines = self.log_panel[1].poll()
+            if lines:
+                self.ui_pump.push(self.log_text, lines)
         except Exception as e:
             pass
 
@@ -1111,6 +4872,7 @@ class BotManager:
             self.main_window.after(1000, self.schedule_status_update)
 
     def create_system_tray(self):
+        load_tray_modules()
         menu = pystray.Menu(
             item('Open Interface', self.show_main_window),
             pystray.Menu.SEPARATOR,
@@ -1122,11 +4884,25 @@ class BotManager:
         )
         
         icon = pystray.Icon("BotManager", self.create_tray_icon(), "Bot Manager", menu)
+        self.supervisor.subscribe(self.update_tray_title)
         return icon
 
+    def update_tray_title(self, snapshot):
+        """Status listener: running count in the tray tooltip"""
+        if self.system_tray is None:
+            return
+        running = sum(1 for info in snapshot.bots.values() if info['running'])
+        self.system_tray.title = f"Bot Manager - {running}/{len(snapshot.bots)} running"
+
     def quit_application(self, icon=None, item=None):
         try:
-            self.kill_all_bots()
+            self.metrics_sampler.stop()
+            if self.config.get("detach_on_exit", False):
+                self.detach_bots()
+            else:
+                self.kill_all_bots()
+            if self.archive is not None:
+                self.archive.close()
             if self.system_tray:
                 self.system_tray.stop()
             if self.main_window:
@@ -1148,6 +4924,13 @@ class BotManager:
         #     for bot_folder in self.config["all_bots"]:
         #         self.schedule_restart(bot_folder)
         
+        self.restore_state()
+        self.metrics_sampler.start()
+        if self.config.get("api_enabled", False):
+            self.start_control_api()
+        if self.config.get("folder_watch", False):
+            self.scheduler.schedule("folder-watch", 0, self.watch_bot_folders, label="folder watch")
+
         # Create and run interface
         if not self.config.get("start_minimized", False):
             self.create_main_window()
@@ -1163,9 +4946,138 @@ class BotManager:
         else:
             self.system_tray.run()
 
-def main():
-    manager = BotManager()
-    manager.run()
+    def run_daemon(self, bots=()):
+        """Supervise bots without any GUI until SIGINT/SIGTERM"""
+        stop_event = threading.Event()
+
+        def handle_signal(signum, frame):
+            stop_event.set()
+
+        signal.signal(signal.SIGINT, handle_signal)
+        signal.signal(signal.SIGTERM, handle_signal)
+
+        self.restore_state()
+        self.metrics_sampler.start()
+        if self.config.get("api_enabled", False):
+            self.start_control_api()
+        if self.config.get("folder_watch", False):
+            self.scheduler.schedule("folder-watch", 0, self.watch_bot_folders, label="folder watch")
+        for bot_folder in bots:
+            self.start_bot(bot_folder)
+        self.logger.info(f"Daemon started, {len(self.bot_process_objs)} bots launched")
+
+        while not stop_event.wait(1):
+            self.reap_exited_bots()
+
+        self.logger.info("Daemon stopping")
+        self.stop_control_api()
+        self.bulk.shutdown()
+        self.metrics_sampler.stop()
+        if self.config.get("detach_on_exit", False):
+            self.detach_bots()
+        else:
+            for bot_folder in list(self.bot_process_objs):
+                self.kill_bot(bot_folder)
+        if self.archive is not None:
+            self.archive.close()
+
+def format_uptime(seconds):
+    seconds = int(seconds)
+    if seconds <= 0:
+        return "-"
+    return f"{seconds // 3600:02d}:{(seconds % 3600) // 60:02d}:{seconds % 60:02d}"
+
+def print_status(manager, bots, as_json=False):
+    """Print one status line per bot from a single process sweep"""
+    manager.restore_state(supervise=False)
+    manager.metrics_sampler.sample_once()
+    status = manager.get_bot_status()
+    now = time.time()
+    rows = []
+    for bot_folder in bots:
+        info = status.get(bot_folder) or {'running': manager.is_bot_running(bot_folder), 'pid': None}
+        pid = manager.bot_processes.get(bot_folder) if info['running'] else None
+        sample = manager.metrics_sampler.get(bot_folder, pid) if pid else None
+        identity = manager.registry.get(bot_folder) if pid else None
+        uptime = now - identity.create_time if identity is not None else 0
+        rows.append({
+            'bot': bot_folder,
+            'running': info['running'],
+            'pid': pid,
+            'rss': sample['rss'] if sample else None,
+            'uptime': int(uptime)
+        })
+
+    if as_json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{'BOT':<24} {'STATUS':<8} {'PID':>8} {'MEMORY':>9} {'UPTIME':>10}")
+    for row in rows:
+        mem = f"{row['rss'] // (1024*1024)} MB" if row['rss'] is not None else "-"
+        print(f"{row['bot']:<24} {'running' if row['running'] else 'stopped':<8} "
+              f"{row['pid'] or '-':>8} {mem:>9} {format_uptime(row['uptime']):>10}")
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(prog="koremanager", description="Bot Manager")
+    commands = parser.add_subparsers(dest="command")
+
+    commands.add_parser("gui", help="open the window and tray icon (default)")
+
+    daemon = commands.add_parser("daemon", help="run headless and supervise bots until stopped")
+    daemon.add_argument("bots", nargs="*", help="bots to start on launch")
+    daemon.add_argument("--all", action="store_true", help="start every configured bot")
+    daemon.add_argument("--api", action="store_true", help="serve the control API even if disabled in config")
+
+    status = commands.add_parser("status", help="show bot status and exit")
+    status.add_argument("bots", nargs="*", help="bots to show (default: all configured)")
+    status.add_argument("--json", action="store_true", help="print JSON instead of a table")
+
+    for name in ("start", "stop", "restart"):
+        action = commands.add_parser(name, help=f"{name} bots and exit")
+        action.add_argument("bots", nargs="*", help="bot folder names")
+        action.add_argument("--all", action="store_true", help="every configured bot")
+    return parser
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    command = args.command or "gui"
+
+    if command == "gui":
+        manager = BotManager()
+        manager.run()
+        return 0
+
+    if command == "daemon":
+        manager = BotManager()
+        if args.api:
+            manager.config["api_enabled"] = True
+        manager.run_daemon(manager.BOT_FOLDERS if args.all else args.bots)
+        return 0
+
+    # One-shot commands share the log with a running manager instead of truncating it
+    manager = BotManager(log_filemode='a')
+    bots = manager.BOT_FOLDERS if getattr(args, 'all', False) or not args.bots else args.bots
+
+    if command == "status":
+        print_status(manager, bots, args.json)
+        return 0
+
+    if not args.bots and not args.all:
+        print(f"{command}: no bots given (use --all for every configured bot)", file=sys.stderr)
+        return 2
+
+    # This process exits right away: nothing would read captured output or
+    # fire restart timers, so launch bots detached from both
+    manager.config["capture_output"] = False
+    manager.config["auto_restart"] = False
+    manager.restore_state(supervise=False)
+    action = {'start': manager.start_bot, 'stop': manager.kill_bot, 'restart': manager.restart_bot}[command]
+    failed = [bot_folder for bot_folder in bots if not action(bot_folder)]
+    # start.exe must be renamed back before this process goes away
+    manager.scheduler.wait_idle("rename:", timeout=15)
+    for bot_folder in bots:
+        print(f"{bot_folder}: {'failed' if bot_folder in failed else 'ok'}")
+    return 1 if failed else 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
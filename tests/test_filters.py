@@ -0,0 +1,41 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from koremanager import FilterSet
+
+
+class FilterSetTest(unittest.TestCase):
+    def test_plain_patterns_share_one_regex(self):
+        filters = FilterSet(["error", "warn"])
+        shown = filters.apply("b1", ["an error here", "nothing", "warn: low hp"])
+        self.assertEqual(shown, [("an error here", [(3, 8)]), ("warn: low hp", [(0, 4)])])
+        self.assertEqual([(p, total) for p, total, _ in filters.hit_stats("b1")], [("error", 1), ("warn", 1)])
+
+    def test_backreference_keeps_its_own_group(self):
+        filters = FilterSet(["warn", r"(\w)\1"])
+        shown = filters.apply("b1", ["aa", "ab", "warn"])
+        self.assertEqual(shown, [("aa", [(0, 2)]), ("warn", [(0, 4)])])
+        self.assertEqual([(p, total) for p, total, _ in filters.hit_stats("b1")], [("warn", 1), (r"(\w)\1", 1)])
+
+    def test_backreference_to_first_group(self):
+        filters = FilterSet([r"(a)\1"])
+        self.assertEqual(filters.apply("b1", ["xaax", "xax"]), [("xaax", [(1, 3)])])
+
+    def test_named_group_that_clashes_with_internal_names(self):
+        filters = FilterSet(["warn", r"(?P<f0>hp) low"])
+        self.assertEqual(filters.apply("b1", ["hp low", "warn"]), [("hp low", [(0, 6)]), ("warn", [(0, 4)])])
+
+    def test_exclude_with_backreference(self):
+        filters = FilterSet(exclude=["debug", r"(\d)\1"])
+        self.assertEqual(filters.apply("b1", ["11 hits", "12 hits", "debug x"]), [("12 hits", ())])
+
+    def test_invalid_pattern_raises(self):
+        with self.assertRaises(Exception):
+            FilterSet(["("])
+
+
+if __name__ == "__main__":
+    unittest.main()
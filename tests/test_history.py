@@ -0,0 +1,47 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from koremanager import BotHistory
+
+
+def fill(history, start, seconds):
+    for ts in range(start, start + seconds):
+        history.add(float(ts), cpu=1.0, rss=100.0, threads=2)
+
+
+class BotHistoryRowsTest(unittest.TestCase):
+    def test_young_bot_keeps_second_detail(self):
+        history = BotHistory()
+        fill(history, 6000, 300)  # five minutes: some minute buckets, no hour bucket yet
+        rows = history.rows(start=0)
+        self.assertEqual(len(rows), 300)
+        self.assertEqual(rows[0][0], 6000.0)
+
+    def test_older_stretch_comes_from_coarser_tier(self):
+        history = BotHistory()
+        fill(history, 6000, 1200)  # 20 minutes: the 1 s ring holds the last 15
+        rows = history.rows(start=6000)
+        times = [row[0] for row in rows]
+        self.assertEqual(times, sorted(times))
+        self.assertEqual(times[0], 6000.0)
+        self.assertEqual(times[-1], 7199.0)
+        second_ring_oldest = history.tiers[0].oldest()
+        self.assertEqual(times[-900:], [float(ts) for ts in range(7200 - 900, 7200)])
+        # Before the 1 s ring only whole minutes appear
+        self.assertTrue(all(ts % 60 == 0 for ts in times if ts < second_ring_oldest))
+
+    def test_start_inside_finest_tier_uses_only_it(self):
+        history = BotHistory()
+        fill(history, 6000, 1200)
+        rows = history.rows(start=7000, end=7010)
+        self.assertEqual([row[0] for row in rows], [float(ts) for ts in range(7000, 7011)])
+
+    def test_empty(self):
+        self.assertEqual(BotHistory().rows(start=0), [])
+
+
+if __name__ == "__main__":
+    unittest.main()